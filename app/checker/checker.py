@@ -1,29 +1,79 @@
 # app/checker/checker.py
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Sized
 import logging
+import functools
 import json
-import re
+import queue
+import threading
 
-from .rules import evaluate_rule
+from app.utils import compute_text_hash
+from .rules import (
+    evaluate_rule, prepare_rule, build_keyword_matcher, find_keywords, word_count, RegexMaster, AffixIndex
+)
 
 logger = logging.getLogger(__name__)
 
+# -----------------------------------------------------------
+# Helper: precompile rules once per Checker
+# -----------------------------------------------------------
+# Relative cost per rule type; cheap checks run first
+_RULE_COST = {
+    'length_min': 0, 'starts_with': 0, 'ends_with': 0,
+    'word_count_min': 1, 'uppercase_ratio': 1,
+    'keyword_any': 2, 'contains_phrase': 2, 'not_contains': 2,
+    'regex_match': 3,
+}
+
+
+def _prepare_rules(rules: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], ...]:
+    prepared = []
+    for rule in rules:
+        try:
+            prepared.append(prepare_rule(rule))
+        except Exception as e:
+            # Keep the raw rule; evaluate_rule will surface the error per item
+            logger.error("Could not prepare rule %s: %s", rule.get('id'), e)
+            prepared.append(rule)
+    # Stable sort: rules of equal cost keep their file order
+    prepared.sort(key=lambda r: _RULE_COST.get(r.get('type'), 4))
+    return tuple(prepared)
+
+
 # -----------------------------------------------------------
 # Helper: word count
 # -----------------------------------------------------------
-def count_words(text: str) -> int:
+def count_words(text: str, stats: Optional[Dict[str, int]] = None) -> int:
+    # Same whitespace split as word_count_min, so one count serves both
     if not text:
         return 0
-    return len(re.findall(r"\w+", text))
+    return word_count(text, stats)
 
 
 # -----------------------------------------------------------
 # Main scoring with normalization
 # -----------------------------------------------------------
-def score_text(rules: List[Dict[str, Any]], item: Dict[str, Any]) -> Dict[str, Any]:
+def score_text(
+    rules: List[Dict[str, Any]],
+    item: Dict[str, Any],
+    matcher: Optional[Any] = None,
+    early_exit_score: Optional[float] = None,
+    regex_master: Optional[RegexMaster] = None,
+    affix_index: Optional[AffixIndex] = None
+) -> Dict[str, Any]:
     text = item.get("text", "") or ""
     uid = item.get("uid")
+    # Lowercase once; shared by every substring rule
+    lowered = text.lower()
+    # One automaton pass finds every keyword/phrase/word hit up front
+    found = find_keywords(matcher, lowered) if matcher is not None else None
+    # ...and one combined-regex pass settles most regex_match rules
+    regex_hits = regex_master.scan(text) if regex_master is not None else None
+    # ...and grouped prefix/suffix checks settle starts_with/ends_with rules
+    affix_hits = affix_index.scan(text) if affix_index is not None else None
+    # Word/letter counts computed at most once, shared across rules
+    stats: Dict[str, int] = {}
 
     # Raw rule-based score
     raw_score = 0.0
@@ -31,7 +81,7 @@ def score_text(rules: List[Dict[str, Any]], item: Dict[str, Any]) -> Dict[str, A
 
     for rule in rules:
         try:
-            s, reason = evaluate_rule(rule, text)
+            s, reason = evaluate_rule(rule, text, lowered, found, stats, regex_hits, affix_hits)
             if s:
                 raw_score += float(s)
                 details.append({
@@ -39,6 +89,8 @@ def score_text(rules: List[Dict[str, Any]], item: Dict[str, Any]) -> Dict[str, A
                     'score': float(s),
                     'reason': reason
                 })
+                if early_exit_score is not None and raw_score >= early_exit_score:
+                    break
         except Exception as e:
             logger.exception("Error evaluating rule %s: %s", rule.get('id'), e)
             details.append({
@@ -51,7 +103,7 @@ def score_text(rules: List[Dict[str, Any]], item: Dict[str, Any]) -> Dict[str, A
     # NORMALIZATION STEP
     # score_per_100_words = raw_score / (word_count / 100)
     # -------------------------------------------------------
-    wc = count_words(text)
+    wc = count_words(text, stats)
 
     if wc > 0:
         normalized_score = raw_score / (wc / 100)
@@ -61,57 +113,233 @@ def score_text(rules: List[Dict[str, Any]], item: Dict[str, Any]) -> Dict[str, A
     # Round for nicer UI output
     normalized_score = round(normalized_score, 3)
 
+    # Encode details here so it runs in the (parallel) worker, not the saver
+    try:
+        details_json = json.dumps(details, ensure_ascii=False, separators=(',', ':'))
+    except Exception:
+        details_json = json.dumps(str(details), ensure_ascii=False)
+
     return {
         'uid': uid,
         'text': text,
         'raw_score': raw_score,
         'score': normalized_score,      # <- final normalized score saved to DB
         'details': details,
-        'word_count': wc
+        'details_json': details_json,
+        'word_count': wc,
+        # Reuse the pipeline's hash when the item already carries one
+        'text_hash': item.get("text_hash") or compute_text_hash(text),
+        # Occurrences of this exact chunk in the input (deduplicated upstream)
+        'freq': item.get("freq", 1)
     }
 
 
+# -----------------------------------------------------------
+# Process-pool worker state (set once per worker by _init_worker)
+# -----------------------------------------------------------
+_WORKER_RULES: Tuple[Dict[str, Any], ...] = ()
+_WORKER_MATCHER: Optional[Any] = None
+_WORKER_EARLY_EXIT: Optional[float] = None
+_WORKER_REGEX: Optional[RegexMaster] = None
+_WORKER_AFFIX: Optional[AffixIndex] = None
+
+
+def _init_worker(rules: List[Dict[str, Any]], early_exit_score: Optional[float] = None) -> None:
+    global _WORKER_RULES, _WORKER_MATCHER, _WORKER_EARLY_EXIT, _WORKER_REGEX, _WORKER_AFFIX
+    _WORKER_RULES = _prepare_rules(rules)
+    _WORKER_MATCHER = build_keyword_matcher(_WORKER_RULES)
+    _WORKER_REGEX = RegexMaster(_WORKER_RULES)
+    _WORKER_AFFIX = AffixIndex(_WORKER_RULES)
+    _WORKER_EARLY_EXIT = early_exit_score
+
+
+def make_worker_pool(
+    rules: List[Dict[str, Any]],
+    processes: int = 6,
+    early_exit_score: Optional[float] = None
+) -> Pool:
+    """
+    Long-lived scoring pool: rules are prepared once per worker at start-up.
+    Pass it as Checker(pool=...) with the same rules; the caller closes it.
+    """
+    return Pool(processes=processes, initializer=_init_worker, initargs=(rules, early_exit_score))
+
+
+def _score_text_safe(
+    rules: Tuple[Dict[str, Any], ...],
+    matcher: Optional[Any],
+    early_exit_score: Optional[float],
+    regex_master: Optional[RegexMaster],
+    affix_index: Optional[AffixIndex],
+    item: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """score_text that logs and returns None instead of aborting a map()."""
+    try:
+        return score_text(rules, item, matcher, early_exit_score, regex_master, affix_index)
+    except Exception as e:
+        logger.exception("Error processing item %s: %s", item.get('uid'), e)
+        return None
+
+
+def _score_text_worker(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return _score_text_safe(
+        _WORKER_RULES, _WORKER_MATCHER, _WORKER_EARLY_EXIT, _WORKER_REGEX, _WORKER_AFFIX, item
+    )
+
+
+# -----------------------------------------------------------
+# Background DB writer: drains rows in batches until a None sentinel.
+# The only thread that writes during a run, so scorers never contend for
+# the DB lock and each batch is one transaction.
+# -----------------------------------------------------------
+def _writer_loop(
+    q: "queue.Queue[Optional[Tuple[Any, ...]]]", storage: Any, batch_size: int, failed: List[str]
+) -> None:
+    """`failed` collects the uids of rows whose batch could not be saved."""
+    done = False
+    while not done:
+        row = q.get()
+        if row is None:
+            break
+        batch = [row]
+        while len(batch) < batch_size:
+            try:
+                row = q.get_nowait()
+            except queue.Empty:
+                break
+            if row is None:
+                done = True
+                break
+            batch.append(row)
+        try:
+            storage.save_checks_bulk(batch)
+        except Exception as e:
+            logger.exception("Error saving %d checks: %s", len(batch), e)
+            failed.extend(r[0] for r in batch)
+
+
 # -----------------------------------------------------------
 # Checker class
 # -----------------------------------------------------------
 class Checker:
-    def __init__(self, rules: List[Dict[str, Any]], storage: Optional[Any] = None, max_workers: int = 6):
+    # Below this many items, process start-up costs more than the GIL does
+    PROCESS_MIN_ITEMS = 200
+
+    def __init__(
+        self,
+        rules: List[Dict[str, Any]],
+        storage: Optional[Any] = None,
+        max_workers: int = 6,
+        use_processes: Optional[bool] = None,
+        early_exit_score: Optional[float] = None,
+        pool: Optional[Any] = None
+    ):
+        """
+        use_processes: score in a multiprocessing Pool (True), a thread
+        pool (False), or pick by batch size (None, the default).
+        early_exit_score: stop evaluating an item's remaining rules once its
+        raw score reaches this value.
+        pool: a make_worker_pool() pool for these rules, reused instead of
+        starting (and tearing down) a new Pool on each process run.
+        """
         self.rules = rules or []
+        self._prepared_rules = _prepare_rules(self.rules)
+        self._matcher = build_keyword_matcher(self._prepared_rules)
+        self._regex_master = RegexMaster(self._prepared_rules)
+        self._affix_index = AffixIndex(self._prepared_rules)
         self.storage = storage
         self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.early_exit_score = early_exit_score
+        self.pool = pool
+        # uids of the last run's results that the writer failed to save
+        self.failed_uids: List[str] = []
 
-    def run_checks(self, items: List[Dict[str, Any]], save: bool = True) -> List[Dict[str, Any]]:
-        results = []
+    # Max rows per bulk insert, and rows allowed to queue for the writer
+    SAVE_BATCH_SIZE = 1000
+    SAVE_QUEUE_SIZE = 4096
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
-            futures = {ex.submit(score_text, self.rules, it): it for it in items}
+    def _to_row(self, res: Dict[str, Any]) -> Tuple[Any, ...]:
+        # ------------------------------------------
+        # SAVE: we store normalized score (res["score"])
+        # raw_score is available but not saved to DB
+        # ------------------------------------------
+        return (
+            res['uid'],
+            res['text'],
+            float(res['score'] or 0.0),     # final normalized score
+            res['details_json'],
+            res['text_hash']
+        )
 
-            for fut in as_completed(futures):
-                item = futures[fut]
-                try:
-                    res = fut.result()
-
-                    # ------------------------------------------
-                    # SAVE: we store normalized score (res["score"])
-                    # raw_score is available but not saved to DB
-                    # ------------------------------------------
-                    if save and self.storage:
-                        try:
-                            details_json = json.dumps(res['details'], ensure_ascii=False)
-                        except Exception:
-                            details_json = json.dumps(str(res['details']), ensure_ascii=False)
-
-                        # Save normalized score
-                        self.storage.save_check(
-                            uid=res['uid'],
-                            text=res['text'],
-                            score=res['score'],       # final normalized score
-                            details=details_json
-                        )
+    def run_checks(self, items: Iterable[Dict[str, Any]], save: bool = True) -> List[Dict[str, Any]]:
+        """`items` may be a list or any iterable (e.g. a streaming generator)."""
+        n_items = len(items) if isinstance(items, Sized) else None
+        use_processes = self.use_processes
+        if use_processes is None:
+            # Unsized input is assumed large: it's how big inputs get streamed in
+            use_processes = self.max_workers > 1 and (n_items is None or n_items >= self.PROCESS_MIN_ITEMS)
 
-                    results.append(res)
+        if use_processes:
+            return self._run_checks_processes(items, save)
+        return self._run_checks_threads(items, save)
 
-                except Exception as e:
-                    logger.exception("Error processing item %s: %s", item.get('uid'), e)
+    def _collect(self, scored: Iterable[Optional[Dict[str, Any]]], save: bool) -> List[Dict[str, Any]]:
+        """
+        Gather scored results; rows go to a background writer thread.
+        When saving, results whose batch failed to save are left out of the
+        returned list, and their uids are kept in self.failed_uids.
+        """
+        results = []
+        self.failed_uids = []
+        save = save and self.storage is not None
+        if save:
+            q: "queue.Queue[Optional[Tuple[Any, ...]]]" = queue.Queue(maxsize=self.SAVE_QUEUE_SIZE)
+            writer = threading.Thread(
+                target=_writer_loop, args=(q, self.storage, self.SAVE_BATCH_SIZE, self.failed_uids), daemon=True
+            )
+            writer.start()
 
+        try:
+            for res in scored:
+                if res is None:
+                    continue
+                try:
+                    if save:
+                        q.put(self._to_row(res))
+                    results.append(res)
+                except Exception as e:
+                    logger.exception("Error processing item %s: %s", res.get('uid'), e)
+        finally:
+            if save:
+                q.put(None)
+                writer.join()
+        if self.failed_uids:
+            logger.error(
+                "%d of %d checks were not saved; see the errors above",
+                len(self.failed_uids), len(results)
+            )
+            failed = set(self.failed_uids)
+            results = [res for res in results if res['uid'] not in failed]
         return results
+
+    def _run_checks_processes(self, items: Iterable[Dict[str, Any]], save: bool) -> List[Dict[str, Any]]:
+        """CPU-bound scoring in worker processes; DB writes stay in this process."""
+        if isinstance(items, Sized):
+            chunksize = max(1, len(items) // (4 * self.max_workers))
+        else:
+            chunksize = 16
+
+        if self.pool is not None:
+            return self._collect(self.pool.imap_unordered(_score_text_worker, items, chunksize=chunksize), save)
+
+        with make_worker_pool(self.rules, self.max_workers, self.early_exit_score) as pool:
+            return self._collect(pool.imap_unordered(_score_text_worker, items, chunksize=chunksize), save)
+
+    def _run_checks_threads(self, items: Iterable[Dict[str, Any]], save: bool) -> List[Dict[str, Any]]:
+        score = functools.partial(
+            _score_text_safe, self._prepared_rules, self._matcher,
+            self.early_exit_score, self._regex_master, self._affix_index
+        )
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            return self._collect(ex.map(score, items), save)
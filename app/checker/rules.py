@@ -1,12 +1,30 @@
 # app/checker/rules.py
+import os
 import json
 import re
 import logging
-from typing import Dict, Any, Tuple, Optional, List
+import functools
+import threading
+from typing import Dict, Any, Tuple, Optional, List, Set, Iterable
+
+try:
+    import ahocorasick  # optional: pip install pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import hyperscan  # optional: pip install hyperscan
+except ImportError:
+    hyperscan = None
 
 logger = logging.getLogger(__name__)
 
-def load_rules(path: str) -> List[Dict[str, Any]]:
+def auto_rules_path(path: str) -> str:
+    """Sidecar file for auto-generated rules: data/rules.json -> data/rules.auto.json."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.auto{ext or '.json'}"
+
+def _read_rules_file(path: str) -> List[Dict[str, Any]]:
     try:
         with open(path, "r", encoding="utf-8") as fh:
             data = json.load(fh)
@@ -20,85 +38,399 @@ def load_rules(path: str) -> List[Dict[str, Any]]:
         logger.error("Could not parse rules JSON: %s", e)
         raise
 
-def evaluate_rule(rule: Dict[str, Any], text: Optional[str]) -> Tuple[float, Optional[str]]:
-    t = (text or "")
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+# (path, mtime, sidecar mtime) -> rules; holds only the latest file state
+_RULES_CACHE: Dict[Tuple[str, Optional[int], Optional[int]], List[Dict[str, Any]]] = {}
+
+def load_rules(path: str) -> List[Dict[str, Any]]:
+    """
+    Curated rules from `path` plus any auto-generated rules in its sidecar.
+    Parsed once per file version: editing either file invalidates the cache.
+    """
+    auto_path = auto_rules_path(path)
+    key = (os.path.abspath(path), _mtime(path), _mtime(auto_path))
+    cached = _RULES_CACHE.get(key)
+    if cached is not None:
+        return list(cached)
+
+    rules = _read_rules_file(path)
+    if key[2] is not None:
+        try:
+            rules = rules + _read_rules_file(auto_path)
+        except (FileNotFoundError, ValueError):
+            # Auto rules are optional; a broken sidecar must not block scoring
+            logger.error("Ignoring unreadable auto rules file: %s", auto_path)
+
+    for stale in [k for k in _RULES_CACHE if k[0] == key[0]]:
+        del _RULES_CACHE[stale]
+    _RULES_CACHE[key] = rules
+    return list(rules)
+
+@functools.lru_cache(maxsize=512)
+def _compile(pattern: str) -> "re.Pattern[str]":
+    """Compile a rule regex once; shared by raw (unprepared) rules."""
+    return re.compile(pattern, re.IGNORECASE)
+
+def _to_float(value: Any, default: float) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return default
+
+def _to_int(value: Any, default: int) -> int:
+    try:
+        return int(value)
+    except Exception:
+        return default
+
+def prepare_rule(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return a copy of `rule` with its per-text invariants precomputed
+    (compiled regex, lowered keywords/phrases, parsed thresholds) so
+    evaluate_rule does no repeated setup work per text.
+    """
+    prepared = dict(rule)
     typ = rule.get("type")
-    score = float(rule.get("score", 0) or 0)
+    prepared["_score"] = float(rule.get("score", 0) or 0)
 
     if typ == "keyword_any":
-        kws = rule.get("keywords", []) or []
-        lowered = t.lower()
-        for kw in kws:
-            if not kw:
+        kws = tuple(kw for kw in (rule.get("keywords", []) or []) if kw)
+        prepared["_kws"] = kws
+        prepared["_kws_lower"] = tuple(kw.lower() for kw in kws)
+    elif typ == "uppercase_ratio":
+        prepared["_threshold"] = _to_float(rule.get("threshold", 1.0), 1.0)
+    elif typ == "length_min":
+        prepared["_min_chars"] = _to_int(rule.get("min_chars", 0), 0)
+    elif typ == "regex_match":
+        pattern = rule.get("pattern")
+        compiled = None
+        if pattern:
+            try:
+                compiled = _compile(pattern)
+            except re.error as e:
+                logger.error("Invalid regex in rule %s: %s", rule.get("id"), e)
+        prepared["_compiled"] = compiled
+    elif typ == "contains_phrase":
+        prepared["_phrase_lower"] = (rule.get("phrase") or "").lower()
+    elif typ == "word_count_min":
+        prepared["_min_words"] = _to_int(rule.get("min_words", 0), 0)
+    elif typ == "starts_with":
+        prepared["_prefix"] = rule.get("prefix", "") or ""
+    elif typ == "ends_with":
+        prepared["_suffix"] = rule.get("suffix", "") or ""
+    elif typ == "not_contains":
+        prepared["_word_lower"] = (rule.get("word") or "").lower()
+
+    prepared["_prepared"] = True
+    return prepared
+
+def build_keyword_matcher(rules: Iterable[Dict[str, Any]]) -> Optional[Any]:
+    """
+    Build one Aho-Corasick automaton over every lowered keyword, phrase and
+    not_contains word of the given *prepared* rules, so a single pass over
+    the text finds all of them. Returns None if pyahocorasick is not
+    installed or there is nothing to match.
+    """
+    if ahocorasick is None:
+        return None
+    needles = set()
+    for rule in rules:
+        needles.update(rule.get("_kws_lower", ()))
+        for key in ("_phrase_lower", "_word_lower"):
+            if rule.get(key):
+                needles.add(rule[key])
+    if not needles:
+        return None
+    automaton = ahocorasick.Automaton()
+    for needle in needles:
+        automaton.add_word(needle, needle)
+    automaton.make_automaton()
+    return automaton
+
+def find_keywords(matcher: Any, lowered: str) -> Set[str]:
+    """Return every matcher needle occurring in `lowered`."""
+    return {needle for _, needle in matcher.iter(lowered)}
+
+# Numbered backreferences would point at the wrong group once combined
+_NUMBERED_BACKREF = re.compile(r"\\[1-9]|\(\?P=\d")
+
+# Syntax that Hyperscan's PCRE dialect reads differently from Python re:
+# \Z and {,n}; \s/\S, which in re also match \x1c-\x1f; POSIX classes
+_HS_UNSAFE = re.compile(r"\\Z|\{,|\\[sS]|\[:\w+:\]")
+
+_HS_FLAGS = (
+    (hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8)
+    if hyperscan is not None else 0
+)
+
+def _on_hs_match(rid: int, start: int, end: int, flags: int, hits: Set[int]) -> None:
+    hits.add(rid)
+
+class RegexMaster:
+    """
+    All regex_match patterns of the given *prepared* rules folded into one
+    case-insensitive alternation, so one scan settles most of them:
+      - no match anywhere -> every folded pattern misses
+      - a pattern's group matched -> that pattern hits
+    Patterns shadowed by an earlier overlapping match stay undecided and
+    are searched individually. Patterns that can't be folded safely
+    (backreferences, global inline flags) are never decided here.
+
+    With hyperscan installed, the patterns it accepts are also compiled
+    into one Hyperscan database, which decides every one of them in a
+    single pass over ASCII texts (no shadowing). Non-ASCII texts keep
+    the alternation: Hyperscan's \\w and \\b are ASCII-only.
+    """
+    def __init__(self, rules: Iterable[Dict[str, Any]]):
+        self.pattern: Optional["re.Pattern[str]"] = None
+        self._groups: Dict[str, str] = {}
+        parts = []
+        for rule in rules:
+            compiled = rule.get("_compiled")
+            if compiled is None or compiled.pattern in self._groups.values():
+                continue
+            src = compiled.pattern
+            if _NUMBERED_BACKREF.search(src):
+                continue
+            try:
+                re.compile(f"(?:{src})", re.IGNORECASE)
+            except re.error:
+                continue
+            name = f"_r{len(parts)}"
+            self._groups[name] = src
+            parts.append(f"(?P<{name}>{src})")
+        sources = list(self._groups.values())
+        if parts:
+            try:
+                self.pattern = re.compile("|".join(parts), re.IGNORECASE)
+            except re.error as e:
+                # e.g. the same named group used in two patterns
+                logger.warning("Could not combine regex rules, matching individually: %s", e)
+                self._groups = {}
+        self._all_miss = {src: False for src in self._groups.values()}
+
+        self._hs_db: Optional[Any] = None
+        self._hs_sources: Tuple[str, ...] = ()
+        self._hs_complete = False
+        if hyperscan is not None and sources:
+            self._build_hyperscan(sources)
+
+    def _build_hyperscan(self, sources: List[str]) -> None:
+        accepted = []
+        for src in sources:
+            # Non-ASCII patterns fold case differently (re.I: "ſ" matches "s")
+            if not src.isascii() or _HS_UNSAFE.search(src):
                 continue
-            if kw.lower() in lowered:
+            try:
+                probe = hyperscan.Database()
+                probe.compile(expressions=[src.encode("utf-8")], flags=[_HS_FLAGS], elements=1)
+            except hyperscan.error:
+                continue  # lookarounds, backreferences, empty matches...
+            accepted.append(src)
+        if not accepted:
+            return
+        db = hyperscan.Database()
+        try:
+            db.compile(
+                expressions=[src.encode("utf-8") for src in accepted],
+                ids=list(range(len(accepted))),
+                flags=[_HS_FLAGS] * len(accepted),
+                elements=len(accepted)
+            )
+        except hyperscan.error as e:
+            logger.warning("Could not build Hyperscan database, using re: %s", e)
+            return
+        self._hs_db = db
+        self._hs_sources = tuple(accepted)
+        self._hs_miss = {src: False for src in accepted}
+        # Everything the alternation could decide, Hyperscan decides too
+        self._hs_complete = set(accepted) >= set(self._groups.values())
+        # Scratch space is per scanning thread (Checker scores in threads)
+        self._hs_local = threading.local()
+        logger.debug("Hyperscan handles %d of %d regex rules", len(accepted), len(sources))
+
+    def _scan_hyperscan(self, text: str) -> Dict[str, bool]:
+        scratch = getattr(self._hs_local, "scratch", None)
+        if scratch is None:
+            scratch = self._hs_local.scratch = hyperscan.Scratch(self._hs_db)
+        hits: Set[int] = set()
+        self._hs_db.scan(text.encode("ascii"), match_event_handler=_on_hs_match, context=hits, scratch=scratch)
+        if not hits:
+            return self._hs_miss
+        return {src: i in hits for i, src in enumerate(self._hs_sources)}
+
+    def scan(self, text: str) -> Dict[str, bool]:
+        """Map pattern -> matched, for every pattern this scan decided."""
+        if self._hs_db is not None and text.isascii():
+            decided = self._scan_hyperscan(text)
+            if self._hs_complete:
+                return decided
+            return {**self._scan_alternation(text), **decided}
+        return self._scan_alternation(text)
+
+    def _scan_alternation(self, text: str) -> Dict[str, bool]:
+        if self.pattern is None:
+            return {}
+        fired = {self._groups[m.lastgroup]: True for m in self.pattern.finditer(text)}
+        return fired if fired else self._all_miss
+
+class AffixIndex:
+    """
+    starts_with/ends_with strings of the given *prepared* rules, grouped by
+    length. scan() answers every rule with one tuple startswith/endswith
+    call in the common no-hit case, and otherwise with one slice + set
+    lookup per distinct length instead of one call per rule.
+    """
+    def __init__(self, rules: Iterable[Dict[str, Any]]):
+        prefixes = {r["_prefix"] for r in rules if r.get("type") == "starts_with" and r.get("_prefix")}
+        suffixes = {r["_suffix"] for r in rules if r.get("type") == "ends_with" and r.get("_suffix")}
+        self._prefix_tuple = tuple(prefixes)
+        self._suffix_tuple = tuple(suffixes)
+        self._prefixes_by_len: Dict[int, Set[str]] = {}
+        self._suffixes_by_len: Dict[int, Set[str]] = {}
+        for p in prefixes:
+            self._prefixes_by_len.setdefault(len(p), set()).add(p)
+        for x in suffixes:
+            self._suffixes_by_len.setdefault(len(x), set()).add(x)
+
+    def scan(self, text: str) -> Tuple[Set[str], Set[str]]:
+        """(prefixes `text` starts with, suffixes it ends with)."""
+        prefix_hits: Set[str] = set()
+        suffix_hits: Set[str] = set()
+        if self._prefix_tuple and text.startswith(self._prefix_tuple):
+            for n, group in self._prefixes_by_len.items():
+                head = text[:n]
+                if head in group:
+                    prefix_hits.add(head)
+        if self._suffix_tuple and text.endswith(self._suffix_tuple):
+            for n, group in self._suffixes_by_len.items():
+                tail = text[-n:]
+                if tail in group:
+                    suffix_hits.add(tail)
+        return prefix_hits, suffix_hits
+
+def word_count(t: str, stats: Optional[Dict[str, int]] = None) -> int:
+    """Whitespace-delimited word count, cached in `stats` when given."""
+    if stats is None:
+        return len(t.split())
+    n = stats.get("words")
+    if n is None:
+        n = stats["words"] = len(t.split())
+    return n
+
+# Byte tables for the ASCII fast path of _letter_counts
+_ASCII_UPPER = bytes(range(0x41, 0x5B))
+_ASCII_LOWER = bytes(range(0x61, 0x7B))
+
+def _letter_counts(t: str, stats: Optional[Dict[str, int]]) -> Tuple[int, int]:
+    """(alphabetic chars, uppercase among them), scanned in C."""
+    if stats is not None and "alpha" in stats:
+        return stats["alpha"], stats["upper"]
+    if t.isascii():
+        # bytes.translate with a delete table counts a byte class in one pass
+        b = t.encode("ascii")
+        n = len(b)
+        upper = n - len(b.translate(None, _ASCII_UPPER))
+        alpha = upper + n - len(b.translate(None, _ASCII_LOWER))
+    else:
+        letters = "".join(filter(str.isalpha, t))
+        alpha = len(letters)
+        upper = sum(map(str.isupper, letters))
+    if stats is not None:
+        stats["alpha"] = alpha
+        stats["upper"] = upper
+    return alpha, upper
+
+def evaluate_rule(
+    rule: Dict[str, Any],
+    text: Optional[str],
+    lowered: Optional[str] = None,
+    found: Optional[Set[str]] = None,
+    stats: Optional[Dict[str, int]] = None,
+    regex_hits: Optional[Dict[str, bool]] = None,
+    affix_hits: Optional[Tuple[Set[str], Set[str]]] = None
+) -> Tuple[float, Optional[str]]:
+    """
+    Score one rule against one text. `lowered` is text.lower(); callers
+    evaluating many rules should compute it once and pass it in.
+    `found` is the result of find_keywords() for this text; when given,
+    substring rules test membership in it instead of scanning the text.
+    `stats` is a per-text dict caching word/letter counts across rules.
+    `regex_hits` is RegexMaster.scan() for this text; patterns it decided
+    are not searched again. `affix_hits` is AffixIndex.scan() for this text.
+    """
+    if not rule.get("_prepared"):
+        rule = prepare_rule(rule)
+    t = (text or "")
+    if lowered is None:
+        lowered = t.lower()
+    typ = rule.get("type")
+    score = rule["_score"]
+
+    if typ == "keyword_any":
+        haystack = lowered if found is None else found
+        for kw, kw_lower in zip(rule["_kws"], rule["_kws_lower"]):
+            if kw_lower in haystack:
                 return score, f"found_keyword:{kw}"
         return 0, None
 
     if typ == "uppercase_ratio":
-        letters = [c for c in t if c.isalpha()]
-        if not letters:
+        alpha, ups = _letter_counts(t, stats)
+        if not alpha:
             return 0, None
-        ups = sum(1 for c in letters if c.isupper())
-        ratio = ups / len(letters)
-        try:
-            thresh = float(rule.get("threshold", 1.0))
-        except Exception:
-            thresh = 1.0
-        if ratio >= thresh:
+        ratio = ups / alpha
+        if ratio >= rule["_threshold"]:
             return score, f"uppercase_ratio:{ratio:.2f}"
         return 0, None
 
     if typ == "length_min":
-        try:
-            min_chars = int(rule.get("min_chars", 0))
-        except Exception:
-            min_chars = 0
-        if len(t) >= min_chars:
+        if len(t) >= rule["_min_chars"]:
             return score, f"length:{len(t)}"
         return 0, None
 
     if typ == "regex_match":
-        pattern = rule.get("pattern")
-        if not pattern:
+        compiled = rule["_compiled"]
+        if compiled is None:
             return 0, None
-        try:
-            if re.search(pattern, t, flags=re.IGNORECASE):
-                return score, f"regex_match:{pattern}"
-        except re.error as e:
-            logger.error("Invalid regex in rule %s: %s", rule.get("id"), e)
+        hit = regex_hits.get(compiled.pattern) if regex_hits else None
+        if hit is None:
+            hit = compiled.search(t) is not None
+        if hit:
+            return score, f"regex_match:{compiled.pattern}"
         return 0, None
 
     if typ == "contains_phrase":
-        phrase = (rule.get("phrase") or "").lower()
-        if phrase and phrase in t.lower():
+        phrase = rule["_phrase_lower"]
+        if phrase and phrase in (lowered if found is None else found):
             return score, f"found_phrase:{phrase}"
         return 0, None
 
     if typ == "word_count_min":
-        try:
-            min_words = int(rule.get("min_words", 0))
-        except Exception:
-            min_words = 0
-        if len(t.split()) >= min_words:
-            return score, f"word_count:{len(t.split())}"
+        n_words = word_count(t, stats)
+        if n_words >= rule["_min_words"]:
+            return score, f"word_count:{n_words}"
         return 0, None
 
     if typ == "starts_with":
-        prefix = rule.get("prefix", "")
-        if prefix and t.startswith(prefix):
+        prefix = rule["_prefix"]
+        if prefix and (t.startswith(prefix) if affix_hits is None else prefix in affix_hits[0]):
             return score, f"starts_with:{prefix}"
         return 0, None
 
     if typ == "ends_with":
-        suffix = rule.get("suffix", "")
-        if suffix and t.endswith(suffix):
+        suffix = rule["_suffix"]
+        if suffix and (t.endswith(suffix) if affix_hits is None else suffix in affix_hits[1]):
             return score, f"ends_with:{suffix}"
         return 0, None
 
     if typ == "not_contains":
-        word = (rule.get("word") or "").lower()
-        if word and word not in t.lower():
+        word = rule["_word_lower"]
+        if word and word not in (lowered if found is None else found):
             return score, f"not_contains:{word}"
         return 0, None
 
@@ -16,16 +16,16 @@ Outputs:
 """
 
 import os
+import mmap
 import time
 import psutil
 import cProfile
 import pstats
 from multiprocessing import Pool, cpu_count
 
-from text_processing.text_breaker import break_text_into_groups
-from checker.rules import load_rules
-from checker.checker import Checker
-from storage.storage import Storage
+from app.checker.rules import load_rules
+from app.checker.checker import Checker
+from app.storage.storage import Storage
 from app.utils import ensure_dir
 
 
@@ -48,6 +48,19 @@ def chunk_text(text, chunk_size=5000):
     return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
 
 
+def iter_chunks(file_path, chunk_size=5000):
+    """
+    Stream fixed-size chunks straight from a memory-mapped file, so peak
+    memory stays at one chunk instead of the whole decoded text.
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(0, len(mm), chunk_size):
+                yield mm[i:i + chunk_size].decode("utf-8", "ignore")
+
+
 # ------------------------------------------------------------
 # 3. SIMPLE ANALYSIS FUNCTION (CPU benchmark)
 # ------------------------------------------------------------
@@ -59,11 +72,11 @@ def analyze_chunk(chunk):
 
 
 def run_parallel_cpu_benchmark(chunks):
-    """Tests multiprocessing CPU performance."""
+    """Tests multiprocessing CPU performance. `chunks` may be a generator."""
     start = time.time()
 
     with Pool(processes=cpu_count()) as pool:
-        results = pool.map(analyze_chunk, chunks)
+        results = list(pool.imap_unordered(analyze_chunk, chunks, chunksize=16))
 
     end = time.time()
     print(f"Parallel CPU benchmark completed in {end - start:.2f} sec")
@@ -94,10 +107,15 @@ def profile_function(func, *args):
 # ------------------------------------------------------------
 # 5. SYSTEM MONITOR
 # ------------------------------------------------------------
+# Prime the CPU counter so later non-blocking reads return a real delta
+psutil.cpu_percent(interval=None)
+
+
 def monitor_resources():
+    """RAM (MB) and system CPU % since the previous call — never blocks."""
     process = psutil.Process(os.getpid())
     memory = process.memory_info().rss / (1024 ** 2)
-    cpu = psutil.cpu_percent(interval=1)
+    cpu = psutil.cpu_percent(interval=None)
     return memory, cpu
 
 
@@ -121,15 +139,9 @@ def run_full_pipeline_test():
     # Step 1 — Load rules
     rules = load_rules(rules_path)
 
-    # Step 2 — Load text (streaming)
-    print("Loading text from file...")
-    text_data = "\n".join(list(read_large_file(file_path)))
-    print(f"Loaded text length: {len(text_data):,} characters")
-
-    # Step 3 — Chunk text
-    print("\nSplitting text into chunks...")
-    chunks = chunk_text(text_data, chunk_size=8000)
-    print(f"Chunks created: {len(chunks)}")
+    # Step 2/3 — Stream chunks from the file (never held whole in memory)
+    chunk_size = 8000
+    print("Streaming text chunks from file...")
 
     # Step 4 — Monitor usage BEFORE benchmark
     mem_before, cpu_before = monitor_resources()
@@ -137,7 +149,10 @@ def run_full_pipeline_test():
 
     # Step 5 — Benchmark parallel CPU work
     print("\nRunning CPU benchmark...")
-    cpu_results, cpu_time = run_parallel_cpu_benchmark(chunks)
+    cpu_results, cpu_time = run_parallel_cpu_benchmark(iter_chunks(file_path, chunk_size))
+    num_chunks = len(cpu_results)
+    total_chars = sum(r["chars"] for r in cpu_results)
+    print(f"Chunks streamed: {num_chunks} ({total_chars:,} characters)")
 
     # Step 6 — Rule checker speed test
     print("\nRunning rule scoring benchmark...")
@@ -145,7 +160,7 @@ def run_full_pipeline_test():
     checker = Checker(rules, storage, max_workers=cpu_count())
 
     start = time.time()
-    checker_input = [{"uid": f"{i}", "text": c} for i, c in enumerate(chunks)]
+    checker_input = ({"uid": f"{i}", "text": c} for i, c in enumerate(iter_chunks(file_path, chunk_size)))
     checker.run_checks(checker_input, save=False)
     checker_time = time.time() - start
 
@@ -159,8 +174,8 @@ def run_full_pipeline_test():
 
     with open(summary_path, "w") as f:
         f.write("=== PERFORMANCE SUMMARY ===\n")
-        f.write(f"Total text size: {len(text_data):,} chars\n")
-        f.write(f"Chunks created: {len(chunks)}\n")
+        f.write(f"Total text size: {total_chars:,} chars\n")
+        f.write(f"Chunks created: {num_chunks}\n")
         f.write(f"CPU test time: {cpu_time:.2f} sec\n")
         f.write(f"Rule scoring time: {checker_time:.2f} sec\n")
         f.write(f"RAM before: {mem_before:.2f} MB\n")
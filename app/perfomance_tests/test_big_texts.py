@@ -13,6 +13,7 @@ Use this to verify scaling on large inputs.
 import time
 import os
 from app.text_processing.parallel_break_loader import parallel_process_text
+from app.text_processing.text_loader import load_file
 from app.utils import get_logger, get_env
 
 logger = get_logger(__name__)
@@ -43,8 +44,7 @@ def test_large_text_file(
         return
 
     logger.info("Loading large text file: %s", file_path)
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        big_text = f.read()
+    big_text = load_file(file_path)
 
     logger.info("Text loaded. Length: %s characters", f"{len(big_text):,}")
 
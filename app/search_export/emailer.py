@@ -1,6 +1,7 @@
 # app/search_export/emailer2.py
 from email.message import EmailMessage
 import os
+import heapq
 import json
 import logging
 from typing import List, Dict, Any, Optional
@@ -11,9 +12,8 @@ logger = logging.getLogger(__name__)
 def build_summary_email(check_results: List[Dict[str, Any]], smtp_from: str, smtp_to: str, min_score_alert: Optional[float] = None) -> EmailMessage:
     total = len(check_results)
     avg_score = sum((r.get("score") or 0) for r in check_results) / total if total else 0.0
-    sorted_results = sorted(check_results, key=lambda r: r.get("score", 0), reverse=True)
-    top = sorted_results[:5]
-    low = sorted_results[-5:]
+    # Top-k selection is O(N log k); no need to sort every result
+    top = heapq.nlargest(5, check_results, key=lambda r: r.get("score") or 0)
     body_lines = [
         f"Summary of checks",
         f"Total checked: {total}",
@@ -1,30 +1,130 @@
 # app/storage/storage2.py
 import sqlite3
 import json
-from contextlib import closing
+import re
+import functools
+import time
+import threading
+import contextlib
 import logging
-from typing import Optional, List, Dict, Any
+from collections import Counter
+from typing import Optional, List, Dict, Any, Tuple, Iterator, Iterable, Set
 
 from app.utils import compute_text_hash   # <-- IMPORTANT NEW IMPORT
 
 logger = logging.getLogger(__name__)
 
+_SELECT_COLS = "SELECT id, uid, text, score, details, ts, text_hash FROM checks"
+
+# Stay under SQLITE_MAX_VARIABLE_NUMBER (999 on older builds)
+_MAX_PARAMS = 900
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_ci(pattern: str) -> "re.Pattern[str]":
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _regexp(pattern: str, value: Optional[str]) -> bool:
+    """SQLite REGEXP implementation: `value REGEXP pattern`."""
+    return value is not None and _compile_ci(pattern).search(value) is not None
+
+
+def _row_to_dict(r: Tuple[Any, ...]) -> Dict[str, Any]:
+    try:
+        details = json.loads(r[4]) if r[4] else None
+    except Exception:
+        details = r[4]
+
+    return {
+        'id': r[0],
+        'uid': r[1],
+        'text': r[2],
+        'score': r[3],
+        'details': details,
+        'ts': r[5],
+        'text_hash': r[6]
+    }
+
+
+# Rule-hit counts computed inside SQLite (json1). Details that older rows
+# stored JSON-encoded twice are unwrapped first; invalid JSON is skipped.
+_RULE_HITS_SQL = """
+    SELECT json_extract(j.value, '$.rule_id') AS rid, COUNT(*)
+    FROM (
+        SELECT CASE json_type(details) WHEN 'text' THEN json_extract(details, '$')
+                                       ELSE details END AS d
+        FROM (SELECT details FROM checks ORDER BY id DESC LIMIT ?)
+        WHERE json_valid(details)
+    ) AS c, json_each(c.d) AS j
+    WHERE json_valid(c.d) AND j.type = 'object'
+    GROUP BY rid
+    HAVING rid IS NOT NULL
+"""
+
+
 class Storage:
+    # Fixed SQL text per filter combination (min_score?, max_score?), so
+    # sqlite3's statement cache reuses the prepared statement every call
+    _QUERY_CHECKS_SQL = {
+        (False, False): f"{_SELECT_COLS} ORDER BY id DESC LIMIT ?",
+        (True, False): f"{_SELECT_COLS} WHERE score >= ? ORDER BY id DESC LIMIT ?",
+        (False, True): f"{_SELECT_COLS} WHERE score <= ? ORDER BY id DESC LIMIT ?",
+        (True, True): f"{_SELECT_COLS} WHERE score >= ? AND score <= ? ORDER BY id DESC LIMIT ?",
+    }
+
     def __init__(self, db_path: str = "checks.db", timeout: float = 5.0):
         self.db_path = db_path
         self.timeout = timeout
+        # One connection for the lifetime of the instance, shared across
+        # threads and serialized by the lock
+        self._lock = threading.Lock()
+        self._db = self._conn()
         self._init_db()
 
     def _conn(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.timeout)
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, timeout=self.timeout, cached_statements=256
+        )
+        # WAL makes NORMAL safe: commits no longer fsync the main DB file
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Wait this long for other writers instead of failing with "locked"
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        # Serve reads from a 256MB memory map and a 64MB page cache
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-65536")
+        # Sorts/temp b-trees for GROUP BY and index builds stay in RAM
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+        return conn
+
+    @contextlib.contextmanager
+    def locked_connection(self) -> Iterator[sqlite3.Connection]:
+        """The shared connection, held under the lock (e.g. for pandas.read_sql_query)."""
+        with self._lock:
+            yield self._db
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "Storage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
     # -------------------------------------------------------------------
     # Initialize DB — now includes text_hash and auto-migration
     # -------------------------------------------------------------------
     def _init_db(self) -> None:
-        with closing(self._conn()) as conn:
+        with self._lock:
+            conn = self._db
             c = conn.cursor()
 
+            # Write-ahead log: readers don't block the writer, fewer fsyncs
+            c.execute("PRAGMA journal_mode=WAL")
+
             # Create original columns
             c.execute("""
                 CREATE TABLE IF NOT EXISTS checks (
@@ -48,26 +148,124 @@ class Storage:
             c.execute("CREATE INDEX IF NOT EXISTS idx_checks_uid ON checks(uid)")
             c.execute("CREATE INDEX IF NOT EXISTS idx_checks_score ON checks(score)")
             c.execute("CREATE INDEX IF NOT EXISTS idx_checks_hash ON checks(text_hash)")
+            # Covers query_checks_light: newest-first metadata without
+            # touching the table rows (and their text/details overflow pages)
+            c.execute("DROP INDEX IF EXISTS idx_checks_ts_light")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_checks_id_light ON checks(id, uid, score, ts)")
+
+            self._fts = self._init_fts(c)
 
             conn.commit()
             logger.debug("DB initialized at %s", self.db_path)
 
+    # -------------------------------------------------------------------
+    # Full-text index over checks.text, kept in sync by triggers
+    # -------------------------------------------------------------------
+    def _init_fts(self, c: sqlite3.Cursor) -> bool:
+        """Create the FTS5 trigram index; False if this SQLite lacks it."""
+        c.execute("SELECT 1 FROM sqlite_master WHERE name = 'checks_fts'")
+        existed = c.fetchone() is not None
+        try:
+            # Trigram tokens keep search_text's case-insensitive substring
+            # semantics (needs SQLite >= 3.34 built with FTS5)
+            c.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS checks_fts USING fts5("
+                "text, content='checks', content_rowid='id', tokenize='trigram')"
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning("FTS5 unavailable, text search will scan: %s", e)
+            return False
+
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS checks_fts_ai AFTER INSERT ON checks BEGIN
+                INSERT INTO checks_fts(rowid, text) VALUES (new.id, new.text);
+            END
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS checks_fts_ad AFTER DELETE ON checks BEGIN
+                INSERT INTO checks_fts(checks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS checks_fts_au AFTER UPDATE OF text ON checks BEGIN
+                INSERT INTO checks_fts(checks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                INSERT INTO checks_fts(rowid, text) VALUES (new.id, new.text);
+            END
+        """)
+        if not existed:
+            # Index rows written before the FTS table existed
+            c.execute("INSERT INTO checks_fts(checks_fts) VALUES ('rebuild')")
+            logger.warning("Built full-text index for existing checks.")
+        return True
+
     # -------------------------------------------------------------------
     # NEW: Check if a hash already exists (used for deduplication)
     # -------------------------------------------------------------------
     def exists_hash(self, text_hash: str) -> bool:
-        with closing(self._conn()) as conn:
+        with self._lock:
+            conn = self._db
             c = conn.cursor()
             c.execute("SELECT 1 FROM checks WHERE text_hash = ? LIMIT 1", (text_hash,))
             row = c.fetchone()
             return row is not None
 
+    # -------------------------------------------------------------------
+    # Which of these hashes are already stored — one query per 900 hashes
+    # -------------------------------------------------------------------
+    def existing_hashes(self, hashes: Iterable[str]) -> Set[str]:
+        hashes = list(dict.fromkeys(hashes))
+        found: Set[str] = set()
+        with self._lock:
+            conn = self._db
+            c = conn.cursor()
+            for i in range(0, len(hashes), _MAX_PARAMS):
+                batch = hashes[i:i + _MAX_PARAMS]
+                c.execute(
+                    "SELECT DISTINCT text_hash FROM checks "
+                    f"WHERE text_hash IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                found.update(r[0] for r in c.fetchall())
+        return found
+
+    # -------------------------------------------------------------------
+    # Highest row id — cheap "has anything been added?" signature
+    # -------------------------------------------------------------------
+    def max_rowid(self) -> Optional[int]:
+        with self._lock:
+            conn = self._db
+            c = conn.cursor()
+            c.execute("SELECT MAX(id) FROM checks")
+            return c.fetchone()[0]
+
+    # -------------------------------------------------------------------
+    # Cheap "has the DB changed?" marker: data_version moves on commits by
+    # other connections, total_changes on writes through this one
+    # -------------------------------------------------------------------
+    def change_marker(self) -> Tuple[int, int]:
+        with self._lock:
+            conn = self._db
+            c = conn.cursor()
+            c.execute("PRAGMA data_version")
+            return c.fetchone()[0], conn.total_changes
+
+    # -------------------------------------------------------------------
+    # Total number of stored checks
+    # -------------------------------------------------------------------
+    def count_checks(self) -> int:
+        with self._lock:
+            conn = self._db
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*) FROM checks")
+            return c.fetchone()[0]
+
     # -------------------------------------------------------------------
     # Save a chunk with hash support
     # -------------------------------------------------------------------
-    def save_check(self, uid: str, text: str, score: float, details: Any) -> None:
-        # Compute hash for dedupe
-        text_hash = compute_text_hash(text)
+    def save_check(self, uid: str, text: str, score: float, details: Any, text_hash: Optional[str] = None) -> None:
+        # Compute hash for dedupe unless the caller already has it
+        if text_hash is None:
+            text_hash = compute_text_hash(text)
 
         # Serialize details
         try:
@@ -75,7 +273,8 @@ class Storage:
         except Exception:
             details_json = json.dumps(str(details), ensure_ascii=False)
 
-        with closing(self._conn()) as conn:
+        with self._lock:
+            conn = self._db
             c = conn.cursor()
             c.execute(
                 """
@@ -87,81 +286,165 @@ class Storage:
             conn.commit()
             logger.debug("Saved check uid=%s score=%s", uid, score)
 
+    # -------------------------------------------------------------------
+    # Save many chunks in one transaction
+    # rows: (uid, text, score, details_json, text_hash) tuples
+    # -------------------------------------------------------------------
+    # Extra attempts when another process still holds the write lock after
+    # busy_timeout (e.g. a dashboard job and run.py writing the same DB)
+    LOCKED_RETRIES = 3
+
+    def save_checks_bulk(self, rows: List[Tuple[Any, ...]]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            conn = self._db
+            c = conn.cursor()
+            for attempt in range(self.LOCKED_RETRIES + 1):
+                try:
+                    c.executemany(
+                        """
+                        INSERT INTO checks (uid, text, score, details, text_hash)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        rows
+                    )
+                    conn.commit()
+                    break
+                except sqlite3.OperationalError as e:
+                    conn.rollback()
+                    if "locked" not in str(e) or attempt == self.LOCKED_RETRIES:
+                        raise
+                    logger.warning("Database locked; retrying batch of %d rows", len(rows))
+                    time.sleep(0.5 * 2 ** attempt)
+                except Exception:
+                    # Don't leave a half-written batch open on the shared connection
+                    conn.rollback()
+                    raise
+            logger.debug("Saved %d checks in bulk", len(rows))
+
     # -------------------------------------------------------------------
     # Query records from DB
     # -------------------------------------------------------------------
     def query_checks(self, min_score: Optional[float] = None, max_score: Optional[float] = None, limit: int = 1000) -> List[Dict[str, Any]]:
-        with closing(self._conn()) as conn:
+        with self._lock:
+            conn = self._db
             c = conn.cursor()
-            q = "SELECT id, uid, text, score, details, ts, text_hash FROM checks WHERE 1=1"
-            params = []
-
-            if min_score is not None:
-                q += " AND score >= ?"
-                params.append(min_score)
-            if max_score is not None:
-                q += " AND score <= ?"
-                params.append(max_score)
-
-            q += " ORDER BY ts DESC LIMIT ?"
+            q = self._QUERY_CHECKS_SQL[(min_score is not None, max_score is not None)]
+            params = [p for p in (min_score, max_score) if p is not None]
             params.append(limit)
 
             c.execute(q, params)
-            rows = c.fetchall()
+            return [_row_to_dict(r) for r in c.fetchall()]
 
-            results = []
-            for r in rows:
-                try:
-                    details = json.loads(r[4]) if r[4] else None
-                except Exception:
-                    details = r[4]
+    # -------------------------------------------------------------------
+    # Metadata-only query (no text/details) — an index-only scan
+    # -------------------------------------------------------------------
+    def query_checks_light(self, limit: int = 1000) -> List[Dict[str, Any]]:
+        with self._lock:
+            conn = self._db
+            c = conn.cursor()
+            c.execute("SELECT id, uid, score, ts FROM checks ORDER BY id DESC LIMIT ?", (limit,))
+            return [
+                {'id': r[0], 'uid': r[1], 'score': r[2], 'ts': r[3]}
+                for r in c.fetchall()
+            ]
 
-                results.append({
-                    'id': r[0],
-                    'uid': r[1],
-                    'text': r[2],
-                    'score': r[3],
-                    'details': details,
-                    'ts': r[5],
-                    'text_hash': r[6]
-                })
-            return results
+    # -------------------------------------------------------------------
+    # Stream the newest records one at a time instead of building a list
+    # -------------------------------------------------------------------
+    def _iter_rows(self, sql: str, params: Tuple[Any, ...], batch_size: int = 256) -> Iterator[Tuple[Any, ...]]:
+        with self._lock:
+            c = self._db.cursor()
+            c.execute(sql, params)
+        while True:
+            # Lock per batch only, so callers may use storage between rows
+            with self._lock:
+                batch = c.fetchmany(batch_size)
+            if not batch:
+                return
+            yield from batch
+
+    def iter_checks(self, limit: int = 1000, batch_size: int = 256) -> Iterator[Dict[str, Any]]:
+        rows = self._iter_rows(self._QUERY_CHECKS_SQL[(False, False)], (limit,), batch_size)
+        return map(_row_to_dict, rows)
+
+    # Single-column variants: no dict per row, details left as raw JSON text
+    def iter_texts(self, limit: int = 1000) -> Iterator[str]:
+        rows = self._iter_rows("SELECT text FROM checks ORDER BY id DESC LIMIT ?", (limit,))
+        return (r[0] or "" for r in rows)
+
+    def iter_details(self, limit: int = 1000) -> Iterator[Optional[str]]:
+        rows = self._iter_rows("SELECT details FROM checks ORDER BY id DESC LIMIT ?", (limit,))
+        return (r[0] for r in rows)
+
+    # -------------------------------------------------------------------
+    # Rule hit frequency over the newest `limit` rows (None = all rows)
+    # Raises sqlite3.OperationalError if SQLite lacks the JSON functions
+    # -------------------------------------------------------------------
+    def aggregate_rule_hits(self, limit: Optional[int] = None) -> Counter:
+        with self._lock:
+            conn = self._db
+            c = conn.cursor()
+            c.execute(_RULE_HITS_SQL, (-1 if limit is None else limit,))
+            return Counter(dict(c.fetchall()))
+
+    # -------------------------------------------------------------------
+    # Text search done inside SQLite — only matching rows come back
+    # -------------------------------------------------------------------
+    def search_text(self, query: str, use_regex: bool = False, limit: int = 1000) -> List[Dict[str, Any]]:
+        if use_regex:
+            where = "text REGEXP ? OR uid REGEXP ?"
+            params: Tuple[Any, ...] = (query, query)
+        elif self._fts and len(query) >= 3:
+            # Trigram index lookup; a quoted phrase matches the literal substring
+            phrase = '"' + query.replace('"', '""') + '"'
+            where = (
+                "id IN (SELECT rowid FROM checks_fts WHERE checks_fts MATCH ?) "
+                "OR instr(lower(uid), ?) > 0"
+            )
+            params = (phrase, query.lower())
+        elif query.isascii():
+            # SQLite's lower() folds ASCII only, which is all an ASCII needle needs
+            where = "instr(lower(text), ?) > 0 OR instr(lower(uid), ?) > 0"
+            params = (query.lower(), query.lower())
+        else:
+            # Non-ASCII needles need Python's Unicode case folding
+            where = "text REGEXP ? OR uid REGEXP ?"
+            params = (re.escape(query), re.escape(query))
+
+        with self._lock:
+            conn = self._db
+            c = conn.cursor()
+            c.execute(
+                f"{_SELECT_COLS} WHERE {where} ORDER BY id DESC LIMIT ?",
+                (*params, limit)
+            )
+            return [_row_to_dict(r) for r in c.fetchall()]
 
     # -------------------------------------------------------------------
     # Fetch by UID
     # -------------------------------------------------------------------
     def get_check_by_uid(self, uid: str) -> Optional[Dict[str, Any]]:
-        with closing(self._conn()) as conn:
+        with self._lock:
+            conn = self._db
             c = conn.cursor()
             c.execute(
                 "SELECT id, uid, text, score, details, ts, text_hash "
-                "FROM checks WHERE uid = ? ORDER BY ts DESC LIMIT 1",
+                "FROM checks WHERE uid = ? ORDER BY id DESC LIMIT 1",
                 (uid,)
             )
             r = c.fetchone()
             if not r:
                 return None
-
-            try:
-                details = json.loads(r[4]) if r[4] else None
-            except Exception:
-                details = r[4]
-
-            return {
-                'id': r[0],
-                'uid': r[1],
-                'text': r[2],
-                'score': r[3],
-                'details': details,
-                'ts': r[5],
-                'text_hash': r[6]
-            }
+            return _row_to_dict(r)
 
     # -------------------------------------------------------------------
     # Delete single record
     # -------------------------------------------------------------------
     def delete_check(self, uid: str) -> bool:
-        with closing(self._conn()) as conn:
+        with self._lock:
+            conn = self._db
             c = conn.cursor()
             c.execute("DELETE FROM checks WHERE uid = ?", (uid,))
             conn.commit()
@@ -171,7 +454,8 @@ class Storage:
     # Clear DB
     # -------------------------------------------------------------------
     def clear_all(self) -> None:
-        with closing(self._conn()) as conn:
+        with self._lock:
+            conn = self._db
             c = conn.cursor()
             c.execute("DELETE FROM checks")
             conn.commit()
@@ -14,19 +14,100 @@ This version includes FIXES for:
 """
 
 import os
+import re
 import json
+import sqlite3
 import logging
-from collections import Counter, defaultdict
-from typing import List, Dict, Any
+import itertools
+import functools
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 
-from app.utils import ensure_dir, save_json
+from app.utils import ensure_dir, load_json, save_json
+from app.checker.rules import load_rules, auto_rules_path
+
+try:
+    import orjson  # optional: pip install orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Word tokens: letters/digits (Unicode-aware) plus in-word apostrophes
+_WORD_RE = re.compile(r"[\w']+")
+
+RULES_PATH = "data/rules.json"
+
+# Below this many rows, process start-up + pickling costs more than it saves
+PARALLEL_MIN_ROWS = 200
+# Texts per task sent to a worker process
+WORD_BATCH_SIZE = 100
+
+
+def _tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _generate_phrases(words: List[str]) -> Iterator[str]:
+    """Lazily yield all bigrams, then all trigrams, of a token list."""
+    return itertools.chain(
+        (f"{a} {b}" for a, b in zip(words, words[1:])),
+        (f"{a} {b} {c}" for a, b, c in zip(words, words[1:], words[2:])),
+    )
+
+
+def _count_batch(texts: List[str]) -> Tuple[Counter, Counter]:
+    """Word and phrase counts for a batch of texts (top-level so it pickles)."""
+    word_counter = Counter()
+    phrase_counter = Counter()
+    findall = _WORD_RE.findall
+    # Hot loop: _tokenize/_generate_phrases inlined, n-grams fed straight
+    # into Counter.update with no per-row phrase list or chain object
+    for text in texts:
+        words = findall(text.lower())
+        word_counter.update(words)
+        phrase_counter.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        phrase_counter.update(f"{a} {b} {c}" for a, b, c in zip(words, words[1:], words[2:]))
+    return word_counter, phrase_counter
+
+
+def _batches(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    it = iter(items)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_details_json(raw_details: str) -> List[Dict[str, Any]]:
+    # Many rows share byte-identical details strings; decode each one once.
+    # Callers only read the result, so sharing the cached list is safe.
+    loads = orjson.loads if orjson is not None else json.loads
+    parsed = loads(raw_details)
+    if isinstance(parsed, str):
+        # Older rows stored details JSON-encoded twice
+        parsed = loads(parsed)
+    return parsed if isinstance(parsed, list) else []
+
 
 class StorageImprover:
     def __init__(self, storage):
         self.storage = storage
+        # analysis name -> ((limit, change marker), result); any insert or
+        # delete, from this or another connection, changes the marker
+        self._cache = {}
+
+    def _rows_key(self, limit):
+        return (limit, self.storage.change_marker())
+
+    def _cached(self, name, key):
+        hit = self._cache.get(name)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+        return None
 
     # -------------------------------------------------------------
     # SAFE DETAILS PARSER (Important Fix)
@@ -46,10 +127,7 @@ class StorageImprover:
         # Convert JSON string → Python list
         if isinstance(raw_details, str):
             try:
-                parsed = json.loads(raw_details)
-                if isinstance(parsed, list):
-                    return parsed
-                return []
+                return _parse_details_json(raw_details)
             except Exception:
                 logger.warning("Failed to JSON-decode details: %s", raw_details)
                 return []
@@ -61,54 +139,96 @@ class StorageImprover:
     # HELPER: tokenize text
     # -------------------------------------------------------------
     def _tokenize(self, text: str) -> List[str]:
-        return [w.lower() for w in text.split() if w.strip()]
+        return _tokenize(text)
 
     # -------------------------------------------------------------
     # HELPER: generate bigrams & trigrams
     # -------------------------------------------------------------
     def _generate_phrases(self, words):
-        phrases = []
-        for i in range(len(words) - 1):
-            phrases.append(words[i] + " " + words[i + 1])
-        for i in range(len(words) - 2):
-            phrases.append(words[i] + " " + words[i + 2])
-        return phrases
+        return _generate_phrases(words)
 
     # -------------------------------------------------------------
     # 1. WORD/PHRASE FREQUENCY ANALYSIS
     # -------------------------------------------------------------
     def analyze_word_frequency(self, limit=500):
-        rows = self.storage.query_checks(limit=limit)
-        logger.info("Analyzing %d texts for word frequency...", len(rows))
-
-        word_counter = Counter()
-        phrase_counter = Counter()
-
-        for row in rows:
-            text = row.get("text", "")
-            words = self._tokenize(text)
-            word_counter.update(words)
-
-            phrases = self._generate_phrases(words)
-            phrase_counter.update(phrases)
-
+        key = self._rows_key(limit)
+        cached = self._cached("words", key)
+        if cached is not None:
+            logger.info("Rows unchanged since last analysis; reusing word counters")
+            return cached
+
+        logger.info("Analyzing up to %d texts for word frequency...", limit)
+
+        texts = self.storage.iter_texts(limit)
+
+        # Small corpora (fewer than PARALLEL_MIN_ROWS rows) are counted in-process
+        head = list(itertools.islice(texts, PARALLEL_MIN_ROWS))
+        n_rows = len(head)
+
+        if n_rows < PARALLEL_MIN_ROWS:
+            word_counter, phrase_counter = _count_batch(head)
+        else:
+            word_counter = Counter()
+            phrase_counter = Counter()
+            # No more workers than batches the limit allows
+            max_batches = -(-limit // WORD_BATCH_SIZE)
+            workers = min(os.cpu_count() or 1, max_batches)
+            n_rows = 0
+            # Keep ~2 batches per worker in flight and merge in submission
+            # order (deterministic most_common ties); texts stay streamed
+            in_flight = deque()
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                for batch in _batches(itertools.chain(head, texts), WORD_BATCH_SIZE):
+                    n_rows += len(batch)
+                    in_flight.append(ex.submit(_count_batch, batch))
+                    if len(in_flight) >= 2 * workers:
+                        words, phrases = in_flight.popleft().result()
+                        word_counter.update(words)
+                        phrase_counter.update(phrases)
+                while in_flight:
+                    words, phrases = in_flight.popleft().result()
+                    word_counter.update(words)
+                    phrase_counter.update(phrases)
+
+        logger.info("Analyzed %d texts", n_rows)
         logger.info("Found %d unique words", len(word_counter))
         logger.info("Found %d unique phrases", len(phrase_counter))
 
+        self._cache["words"] = (key, (word_counter, phrase_counter))
         return word_counter, phrase_counter
 
     # -------------------------------------------------------------
     # 2. RULE HIT ANALYSIS (Fixed)
     # -------------------------------------------------------------
     def analyze_rule_hits(self, limit=500):
-        rows = self.storage.query_checks(limit=limit)
-        logger.info("Analyzing rule hits for %d rows...", len(rows))
+        key = self._rows_key(limit)
+        cached = self._cached("rule_hits", key)
+        if cached is not None:
+            logger.info("Rows unchanged since last analysis; reusing rule hit counter")
+            return cached
 
-        hit_counter = Counter()
+        logger.info("Analyzing rule hits for up to %d rows...", limit)
+
+        hit_counter = None
+        if hasattr(self.storage, "aggregate_rule_hits"):
+            try:
+                # One GROUP BY over json_each, no per-row decoding in Python
+                hit_counter = self.storage.aggregate_rule_hits(limit)
+            except sqlite3.OperationalError as e:
+                logger.warning("SQL rule-hit aggregation unavailable (%s); counting in Python", e)
+
+        if hit_counter is None:
+            hit_counter = self._count_rule_hits(limit)
+
+        logger.info("Computed rule hit frequency for %d rules", len(hit_counter))
 
-        for row in rows:
-            raw_details = row.get("details")
+        self._cache["rule_hits"] = (key, hit_counter)
+        return hit_counter
+
+    def _count_rule_hits(self, limit):
+        hit_counter = Counter()
 
+        for raw_details in self.storage.iter_details(limit):
             details = self._parse_details(raw_details)
             if not isinstance(details, list):
                 continue
@@ -120,25 +240,43 @@ class StorageImprover:
                 if rule_id is not None:
                     hit_counter[rule_id] += 1
 
-        logger.info("Computed rule hit frequency for %d rules", len(hit_counter))
         return hit_counter
 
     # -------------------------------------------------------------
     # 3. SUGGEST RULES (keyword_any)
     # -------------------------------------------------------------
-    def generate_rule_suggestions(self, word_counter, min_freq=5):
-        suggestions = []
-
-        for word, freq in word_counter.items():
-            if freq >= min_freq and len(word) > 3:
-                suggestions.append({
-                    "type": "keyword_any",
-                    "keywords": [word],
-                    "score": +1,
-                    "source": "auto-generated"
-                })
+    def _existing_keywords(self, rules_path=RULES_PATH):
+        if not os.path.exists(rules_path):
+            return set()
+        try:
+            rules = load_rules(rules_path)
+        except (FileNotFoundError, ValueError):
+            return set()
+        return {
+            str(kw).lower()
+            for r in rules if isinstance(r, dict) and r.get("type") == "keyword_any"
+            for kw in r.get("keywords") or []
+        }
+
+    def generate_rule_suggestions(self, word_counter, min_freq=5, top_n=None, rules_path=RULES_PATH):
+        """
+        keyword_any suggestions for frequent words not already covered by a
+        keyword_any rule in rules_path. top_n limits the scan to the top_n
+        most frequent words instead of the whole vocabulary.
+        """
+        pairs = word_counter.most_common(top_n) if top_n else word_counter.items()
+        existing = self._existing_keywords(rules_path)
 
-        return suggestions
+        return [
+            {
+                "type": "keyword_any",
+                "keywords": [word],
+                "score": +1,
+                "source": "auto-generated"
+            }
+            for word, freq in pairs
+            if freq >= min_freq and len(word) > 3 and word not in existing
+        ]
 
     # -------------------------------------------------------------
     # 4. MAIN ENTRY
@@ -170,22 +308,18 @@ class StorageImprover:
 
         logger.info("Generated %d rule suggestions.", len(suggestions))
 
-        # 4. Auto-update rules.json if required
+        # 4. Auto-update: append to the rules.auto.json sidecar (merged by
+        # load_rules) so the curated rules.json is never rewritten
         if auto_update:
-            rules_path = "data/rules.json"
+            auto_path = auto_rules_path(RULES_PATH)
             try:
-                with open(rules_path, "r") as f:
-                    rules = json.load(f)
+                rules = load_json(auto_path)
             except FileNotFoundError:
                 rules = []
 
-            # Extend rule set
             rules.extend(suggestions)
+            save_json(rules, auto_path)
 
-            # Save back
-            with open(rules_path, "w") as f:
-                json.dump(rules, f, indent=4)
-
-            logger.info("rules.json updated with %d new rules.", len(suggestions))
+            logger.info("%s updated with %d new rules.", auto_path, len(suggestions))
 
         return suggestions
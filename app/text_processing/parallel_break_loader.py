@@ -13,12 +13,13 @@ FULL PIPELINE:
 """
 
 import os
-import uuid
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Union
 
 # Imports from your project
 from app.text_processing.text_breaker import break_text_into_groups
+from app.text_processing.text_loader import _read_file
 from app.checker.rules import load_rules
 from app.checker.checker import Checker
 from app.storage.storage import Storage
@@ -41,24 +42,38 @@ def _make_items_from_texts(
 ) -> List[Dict[str, Any]]:
     """
     Convert raw texts into chunked items with uid + text + text_hash.
+    Identical chunks collapse into one item whose "freq" counts them,
+    so each distinct chunk is hashed and scored only once.
     """
-    items = []
+    items: Dict[str, Dict[str, Any]] = {}
+    total = 0
 
     for t_index, text in enumerate(texts):
         chunks = break_text_into_groups(text, group_size=group_size)
 
         for c_index, chunk in enumerate(chunks):
-            uid = f"{t_index}-{c_index}-{uuid.uuid4().hex[:8]}"
+            total += 1
+            item = items.get(chunk)
+            if item is not None:
+                item["freq"] += 1
+                continue
+
             text_hash = compute_text_hash(chunk)
+            # Deterministic: re-running the same input yields the same uids
+            uid = f"{t_index}-{c_index}-{text_hash[:8]}"
 
-            items.append({
+            items[chunk] = {
                 "uid": uid,
                 "text": chunk,
-                "text_hash": text_hash
-            })
+                "text_hash": text_hash,
+                "freq": 1
+            }
 
-    logger.info("Prepared %d chunk items from %d texts", len(items), len(texts))
-    return items
+    logger.info(
+        "Prepared %d unique chunk items (%d chunks) from %d texts",
+        len(items), total, len(texts)
+    )
+    return list(items.values())
 
 
 # ------------------------------------------------------------
@@ -70,11 +85,14 @@ def parallel_process_text(
     rules_path: Optional[str] = None,
     storage: Optional[Storage] = None,
     max_workers: int = 6,
-    save: bool = False
+    save: bool = False,
+    pool: Optional[Any] = None
 ) -> List[Dict[str, Any]]:
     """
     Main API for the full pipeline:
     Break → Deduplicate → Score → Save → Return
+    pool: optional persistent scoring pool (checker.make_worker_pool)
+    built for the rules in rules_path.
     """
 
     # Normalize input
@@ -103,17 +121,12 @@ def parallel_process_text(
     items = _make_items_from_texts(texts, group_size=group_size)
 
     # DEDUPLICATION BEFORE SCORING
-    unique_items = []
-    skipped_count = 0
-
-    for item in items:
-        text_hash = item["text_hash"]
-
-        if save and storage.exists_hash(text_hash):
-            skipped_count += 1
-            continue   # Skip duplicate chunk
-
-        unique_items.append(item)
+    if save:
+        existing = storage.existing_hashes(it["text_hash"] for it in items)
+        unique_items = [it for it in items if it["text_hash"] not in existing]
+    else:
+        unique_items = items
+    skipped_count = len(items) - len(unique_items)
 
     logger.info(
         "Deduplication complete: %d unique chunks, %d skipped duplicates",
@@ -121,13 +134,21 @@ def parallel_process_text(
     )
 
     # Run scoring
-    checker = Checker(rules=rules, storage=storage, max_workers=max_workers)
+    checker = Checker(rules=rules, storage=storage, max_workers=max_workers, pool=pool)
     results = checker.run_checks(unique_items, save=save)
 
     logger.info("Parallel scoring completed: %d items saved/returned.", len(results))
     return results
 
 
+def _read_file_logged(fpath: str) -> Optional[str]:
+    try:
+        return _read_file(fpath)
+    except Exception as e:
+        logger.exception("Failed reading %s: %s", fpath, e)
+        return None
+
+
 # ------------------------------------------------------------
 # Pipeline for loading entire folder
 # ------------------------------------------------------------
@@ -138,7 +159,8 @@ def pipeline_from_folder(
     storage: Optional[Storage] = None,
     max_workers: int = 6,
     save: bool = False,
-    file_ext: str = ".txt"
+    file_ext: str = ".txt",
+    pool: Optional[Any] = None
 ) -> List[Dict[str, Any]]:
     """
     Load all .txt files → chunk → deduplicate → score.
@@ -147,18 +169,15 @@ def pipeline_from_folder(
     if not os.path.isdir(folder_path):
         raise NotADirectoryError(f"Not a directory: {folder_path}")
 
-    texts = []
-
-    for fname in sorted(os.listdir(folder_path)):
-        if not fname.lower().endswith(file_ext):
-            continue
+    files = [
+        os.path.join(folder_path, f)
+        for f in sorted(os.listdir(folder_path))
+        if f.lower().endswith(file_ext)
+    ]
 
-        fpath = os.path.join(folder_path, fname)
-        try:
-            with open(fpath, "r", encoding="utf-8", errors="ignore") as fh:
-                texts.append(fh.read())
-        except Exception as e:
-            logger.exception("Failed reading %s: %s", fpath, e)
+    # Reads release the GIL, so threads overlap the I/O; map keeps file order
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        texts = [t for t in ex.map(_read_file_logged, files) if t is not None]
 
     logger.info("Loaded %d text files from %s", len(texts), folder_path)
 
@@ -168,5 +187,25 @@ def pipeline_from_folder(
         rules_path=rules_path,
         storage=storage,
         max_workers=max_workers,
-        save=save
+        save=save,
+        pool=pool
     )
+
+
+# ------------------------------------------------------------
+# Folder pipeline as a background job (e.g. ProcessPoolExecutor)
+# ------------------------------------------------------------
+def run_folder_job(
+    folder_path: str,
+    db_path: str,
+    sample_size: int = 3,
+    **kwargs
+) -> Dict[str, Any]:
+    """
+    pipeline_from_folder(save=True) for use in another process.
+    Opens its own Storage (a connection can't be pickled across processes)
+    and returns a small summary instead of every scored chunk.
+    """
+    with Storage(db_path=db_path) as storage:
+        results = pipeline_from_folder(folder_path, storage=storage, save=True, **kwargs)
+    return {"total": len(results), "sample": results[:sample_size]}
@@ -1,21 +1,21 @@
 # app/text_processing/text_breaker.py
-import re
-from typing import List
+from typing import Iterator
 
 def clean_text(text: str) -> str:
     """Collapse whitespace and trim."""
     if not isinstance(text, str):
         return ""
-    return re.sub(r'\s+', ' ', text).strip()
+    # Same result as re.sub(r'\s+', ' ', text).strip(), without the regex engine
+    return " ".join(text.split())
 
-def break_text_into_groups(text: str, group_size: int = 500) -> List[str]:
+def break_text_into_groups(text: str, group_size: int = 500) -> Iterator[str]:
     """
     Breaks text into groups of words (group_size words).
-    Returns list of string chunks.
+    Yields string chunks lazily, so only one joined chunk exists at a time.
     """
-    t = clean_text(text)
-    if not t:
-        return []
-    words = t.split()
-    groups = [words[i:i + group_size] for i in range(0, len(words), group_size)]
-    return [" ".join(g) for g in groups]
+    if not isinstance(text, str) or not text:
+        return
+    # split() already collapses whitespace runs, so no clean_text() copy
+    words = text.split()
+    for i in range(0, len(words), group_size):
+        yield " ".join(words[i:i + group_size])
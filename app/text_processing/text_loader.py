@@ -1,10 +1,19 @@
 # app/text_processing/text_loader.py
 import os
+import mmap
 from concurrent.futures import ThreadPoolExecutor
 from typing import List
 from .text_breaker import clean_text
 
+# Files above this size are decoded straight from a memory map
+MMAP_MIN_BYTES = 50 * 1024 * 1024
+
 def _read_file(file_path: str) -> str:
+    if os.path.getsize(file_path) > MMAP_MIN_BYTES:
+        # Decode from the page cache without an intermediate bytes copy.
+        # Unlike text mode, \r\n is kept as-is (whitespace to the chunker).
+        with open(file_path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8", "ignore")
     with open(file_path, "r", encoding="utf-8", errors="ignore") as fh:
         return fh.read()
 
@@ -11,8 +11,35 @@ logger = logging.getLogger(__name__)
 
 import hashlib
 
-def compute_text_hash(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+try:
+    import xxhash  # optional: pip install xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import orjson  # optional: pip install orjson
+except ImportError:
+    orjson = None
+
+# text_hash is a dedupe fingerprint, not a security boundary. SHA-256 stays
+# the default so hashes match existing databases; TEXT_HASH_ALGO=xxh3 picks
+# the much faster xxh3-128 for new databases.
+TEXT_HASH_ALGO = os.environ.get("TEXT_HASH_ALGO", "sha256").lower()
+if TEXT_HASH_ALGO == "xxh3" and xxhash is None:
+    logger.warning("TEXT_HASH_ALGO=xxh3 but xxhash is not installed; using sha256")
+    TEXT_HASH_ALGO = "sha256"
+
+# Accepts str or already-encoded UTF-8 bytes (same digest for the same text)
+if TEXT_HASH_ALGO == "xxh3":
+    def compute_text_hash(text: Union[str, bytes]) -> str:
+        if isinstance(text, str):
+            text = text.encode("utf-8")
+        return xxhash.xxh3_128_hexdigest(text)
+else:
+    def compute_text_hash(text: Union[str, bytes]) -> str:
+        if isinstance(text, str):
+            text = text.encode("utf-8")
+        return hashlib.sha256(text).hexdigest()
 
 def get_logger(name: str = __name__, level: int = logging.INFO, logfile: Optional[str] = None) -> logging.Logger:
     """Return a configured logger. Add rotating file handler if logfile provided."""
@@ -46,9 +73,21 @@ def load_json(path: str) -> Any:
 
 def save_json(data: Any, path: str, indent: int = 2) -> None:
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # orjson serializes in C but only knows 2-space (or no) indentation
+    payload = None
+    if orjson is not None and indent in (None, 0, 2):
+        opt = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            payload = orjson.dumps(data, option=opt)
+        except orjson.JSONEncodeError:
+            pass  # e.g. ints beyond 64 bits: let json handle it
     try:
-        with open(path, "w", encoding="utf-8") as fh:
-            json.dump(data, fh, ensure_ascii=False, indent=indent)
+        if payload is not None:
+            with open(path, "wb") as fh:
+                fh.write(payload)
+        else:
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump(data, fh, ensure_ascii=False, indent=indent)
         logger.debug("Saved JSON to %s", path)
     except Exception:
         logger.exception("Failed to save JSON to %s", path)
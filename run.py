@@ -19,12 +19,15 @@ Everything is automatic.
 """
 
 import os
-from app.utils import get_env, get_logger, ensure_dir
+import atexit
+from app.utils import get_env, get_logger, ensure_dir, save_json
 from app.storage.storage import Storage
 from app.text_processing.parallel_break_loader import parallel_process_text, pipeline_from_folder
 from app.search_export.search_save import search_in_storage, save_to_csv
 from app.search_export.emailer import build_summary_email, send_email
 from app.storage.storage_improver import StorageImprover
+from app.checker.rules import load_rules
+from app.checker.checker import make_worker_pool
 
 logger = get_logger("direct-run", level="INFO")
 
@@ -37,6 +40,7 @@ RULES_PATH = "data/rules1.json"
 DB_PATH = get_env("DB_PATH", "checks.db")
 EXPORT_PATH = "output/search_export.csv"
 SEND_EMAIL = True      # Change to True if you want real email sending
+MAX_WORKERS = 6
 
 
 # 1. Ensure required folders
@@ -50,6 +54,34 @@ storage = Storage(DB_PATH)
 logger.info(f"Using database: {DB_PATH}")
 
 
+# Scoring pool, started on first use and kept for the life of the process
+# so repeat pipeline runs skip worker start-up and rule preparation.
+# Workers compile the rules once, in their initializer, so the pool is
+# restarted when the rules (or their auto sidecar) change on disk.
+_POOL = None
+_POOL_RULES = None
+
+def get_pool():
+    global _POOL, _POOL_RULES
+    rules = load_rules(RULES_PATH)   # mtime-cached: no re-read if unchanged
+    if _POOL is not None and rules != _POOL_RULES:
+        logger.info("Rules changed on disk; restarting scoring pool.")
+        _close_pool()
+    if _POOL is None:
+        _POOL = make_worker_pool(rules, processes=MAX_WORKERS)
+        _POOL_RULES = rules
+    return _POOL
+
+def _close_pool():
+    global _POOL
+    if _POOL is not None:
+        _POOL.close()
+        _POOL.join()
+        _POOL = None
+
+atexit.register(_close_pool)
+
+
 # 3. Run full pipeline
 def run_full_pipeline():
     logger.info("🚀 Starting Full Pipeline Execution...")
@@ -65,8 +97,9 @@ def run_full_pipeline():
         rules_path=RULES_PATH,
         group_size=500,
         storage=storage,
-        max_workers=6,
-        save=True
+        max_workers=MAX_WORKERS,
+        save=True,
+        pool=get_pool()
     )
 
     logger.info(f"Completed processing. Total chunks processed: {len(results)}")
@@ -84,9 +117,7 @@ def run_improver():
     suggestions = improver.run(limit=500, min_freq=5, auto_update=False)
 
     ensure_dir("improver_output")
-    import json
-    with open("improver_output/suggestions.json", "w") as f:
-        json.dump(suggestions, f, indent=4)
+    save_json(suggestions, "improver_output/suggestions.json")
 
     logger.info(f"Improver generated {len(suggestions)} rule suggestions.")
     return suggestions
@@ -1,30 +1,41 @@
 # streamlit_app2.py
 import os
 import io
+import atexit
+import re
 import json
 import zipfile
+import time
 import tempfile
 import datetime
 from typing import List, Optional, Tuple
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
+from wordcloud import WordCloud, STOPWORDS
 
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 
+try:
+    import pyarrow as pa  # optional: pip install pyarrow
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
 # Project modules (expected to be available in your project)
 from app.storage.storage import Storage
 from app.search_export.search_save import search_in_storage, save_to_csv
-from app.storage.storage_improver import StorageImprover
-from app.text_processing.parallel_break_loader import pipeline_from_folder
-from app.utils import get_env, ensure_dir
+from app.storage.storage_improver import StorageImprover, _parse_details_json
+from app.text_processing.parallel_break_loader import run_folder_job
+from app.utils import get_env, ensure_dir, save_json
 
 # -----------------------
 # Config & initialization
@@ -37,7 +48,6 @@ REPORT_PATH = os.path.join(EXPORT_DIR, "report.pdf")
 
 ensure_dir(TEXT_FOLDER)
 ensure_dir(EXPORT_DIR)
-storage = Storage(DB_PATH)
 
 st.set_page_config(page_title="Parallel Text Processor", layout="wide")
 st.title("📚 Python Parallel Text Processor — Dashboard")
@@ -45,39 +55,145 @@ st.title("📚 Python Parallel Text Processor — Dashboard")
 # -----------------------
 # Utilities
 # -----------------------
-@st.cache_data(ttl=30)
-def load_rows(limit: int = 5000) -> pd.DataFrame:
-    rows = storage.query_checks(limit=limit)
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    return df
+@st.cache_resource
+def get_storage() -> Storage:
+    """One Storage (connection + lock) per server process, opened on first use."""
+    return Storage(DB_PATH)
+
+@st.cache_resource
+def get_pipeline_executor() -> ProcessPoolExecutor:
+    """
+    One background process per server for pipeline runs: the script thread
+    stays free to poll, repeat runs skip process start-up, and runs from
+    different sessions queue instead of writing the DB concurrently.
+    """
+    executor = ProcessPoolExecutor(max_workers=1)
+    atexit.register(executor.shutdown, wait=False, cancel_futures=True)
+    return executor
+
+def db_signature() -> Tuple:
+    """Changes whenever the DB is written (WAL appends don't touch the main file)."""
+    sig = []
+    for path in (DB_PATH, DB_PATH + "-wal"):
+        try:
+            stat = os.stat(path)
+            sig.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_rows(limit: int = 5000, db_sig: Optional[Tuple] = None) -> pd.DataFrame:
+    """Newest `limit` rows as a DataFrame; db_sig only keys the cache."""
+    with get_storage().locked_connection() as conn:
+        return pd.read_sql_query(
+            "SELECT id, uid, text, score, details, ts, text_hash FROM checks ORDER BY id DESC LIMIT ?",
+            conn,
+            params=(limit,)
+        )
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_page(before_id: Optional[int], page_size: int, db_sig: Optional[Tuple] = None) -> pd.DataFrame:
+    """One page, newest first, of the rows with id < before_id (keyset pagination)."""
+    where, params = ("", (page_size,)) if before_id is None else ("WHERE id < ? ", (before_id, page_size))
+    with get_storage().locked_connection() as conn:
+        return pd.read_sql_query(
+            f"SELECT id, uid, text, score, details, ts, text_hash FROM checks {where}ORDER BY id DESC LIMIT ?",
+            conn,
+            params=params
+        )
+
+@st.cache_data(ttl=60, show_spinner=False)
+def count_rows(db_sig: Optional[Tuple] = None) -> int:
+    return get_storage().count_checks()
 
 def parse_details(details_raw) -> List[dict]:
     """Safely parse 'details' field saved in DB (string or list)"""
+    if isinstance(details_raw, list):
+        return details_raw
+    if not isinstance(details_raw, str):
+        return []
     try:
-        if isinstance(details_raw, str):
-            parsed = json.loads(details_raw)
-            if isinstance(parsed, list):
-                return parsed
-        elif isinstance(details_raw, list):
-            return details_raw
+        # Shared decoder: also unwraps rows whose details were JSON-encoded twice
+        return _parse_details_json(details_raw)
     except Exception:
         return []
-    return []
 
-def list_text_files(folder: str) -> List[str]:
-    items = []
-    for f in sorted(os.listdir(folder)):
-        if f.lower().endswith(".txt"):
-            items.append(f)
-    return items
-
-def paginate_df(df: pd.DataFrame, page_size: int, page_number: int) -> pd.DataFrame:
+def top_rules(df: pd.DataFrame, n: Optional[int] = None) -> pd.Series:
+    """Hit count per rule_id over df["details"], most frequent first."""
     if df.empty:
-        return df
-    start = page_number * page_size
-    return df.iloc[start:start + page_size]
+        return pd.Series(dtype="int64")
+    rule_ids = [
+        d.get("rule_id")
+        for details in df["details"].map(parse_details)
+        for d in details if isinstance(d, dict)
+    ]
+    counts = pd.Series(rule_ids, dtype=object).dropna().value_counts()
+    return counts.head(n) if n else counts
+
+# WordCloud.process_text's tokenizer (default min_word_length=0)
+_WC_WORD_RE = re.compile(r"\w[\w']*")
+
+def word_frequencies(texts, stopwords) -> Counter:
+    """
+    Lower-cased word counts over texts, one text at a time (no joined corpus
+    string), filtered like WordCloud.process_text: trailing "'s" stripped,
+    numbers and stopwords dropped, plurals folded into a present singular.
+    Unlike generate(), no two-word collocations are added.
+    """
+    raw = Counter()
+    for t in texts:
+        raw.update(_WC_WORD_RE.findall(str(t).lower()))
+    stop = {w.lower() for w in stopwords}
+    freq = Counter()
+    for word, n in raw.items():
+        if word.endswith("'s"):
+            word = word[:-2]
+        if word.isdigit() or word in stop:
+            continue
+        freq[word] += n
+    for word in list(freq):
+        if word.endswith("s") and not word.endswith("ss") and word[:-1] in freq:
+            freq[word[:-1]] += freq.pop(word)
+    return freq
+
+# Derived views, cached per (limit, db signature) like load_rows, so tab
+# switches reuse them until the DB changes
+@st.cache_data(ttl=600, show_spinner=False)
+def load_light_rows(limit: int = 5000, db_sig: Optional[Tuple] = None) -> pd.DataFrame:
+    """id/uid/score/ts only, for metrics and histograms (no text/details)."""
+    return pd.DataFrame(get_storage().query_checks_light(limit=limit), columns=["id", "uid", "score", "ts"])
+
+@st.cache_data(ttl=600, show_spinner=False)
+def compute_rule_hits(limit: int, db_sig: Optional[Tuple] = None) -> pd.Series:
+    try:
+        # Counted inside SQLite, without loading text into the app
+        return pd.Series(get_storage().aggregate_rule_hits(limit), dtype="int64").sort_values(ascending=False)
+    except Exception:
+        return top_rules(load_rows(limit, db_sig))
+
+@st.cache_data(ttl=600, show_spinner=False)
+def compute_wordcloud(limit: int, db_sig: Optional[Tuple], stopwords: Tuple[str, ...],
+                      width: int = 1200, height: int = 600) -> Tuple[Optional[bytes], pd.DataFrame]:
+    """(PNG bytes, top-50 word weights) for the newest `limit` rows; PNG is None if no words."""
+    freq = word_frequencies(load_rows(limit, db_sig)["text"], stopwords)
+    if not freq:
+        return None, pd.DataFrame(columns=["word", "score"])
+    wc = WordCloud(width=width, height=height, background_color="white").generate_from_frequencies(freq)
+    buf = io.BytesIO()
+    wc.to_image().save(buf, format="PNG")
+    top = pd.DataFrame(list(wc.words_.items()), columns=["word", "score"]).head(50)
+    return buf.getvalue(), top
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _scan_text_files(folder: str, dir_mtime: int) -> List[str]:
+    """dir_mtime only keys the cache: adding/removing a file changes it."""
+    with os.scandir(folder) as entries:
+        # is_file() uses the d_type from the directory read, no stat per entry
+        return sorted(e.name for e in entries if e.name.lower().endswith(".txt") and e.is_file())
+
+def list_text_files(folder: str) -> List[str]:
+    return _scan_text_files(folder, os.stat(folder).st_mtime_ns)
 
 def save_rules_backup(rules_path: str) -> str:
     """Create a timestamped backup of the rules file and return backup path."""
@@ -89,8 +205,11 @@ def save_rules_backup(rules_path: str) -> str:
         bf.write(rf.read())
     return backup_path
 
-def create_pdf_report(df: pd.DataFrame, out_path: str):
-    """Create a simple PDF report with stats, top rules and a wordcloud image."""
+def create_pdf_report(df: pd.DataFrame, out_path: str, rule_hits: Optional[pd.Series] = None):
+    """
+    Create a simple PDF report with stats, top rules and a wordcloud image.
+    rule_hits: precomputed top_rules(df), e.g. from the dashboard cache.
+    """
     c = canvas.Canvas(out_path, pagesize=letter)
     width, height = letter
 
@@ -107,18 +226,11 @@ def create_pdf_report(df: pd.DataFrame, out_path: str):
     c.drawString(40, height - 100, f"Average score: {avg_score}")
 
     # Top rules
-    hit_counter = Counter()
-    for item in df["details"]:
-        details = parse_details(item)
-        for d in details:
-            rid = d.get("rule_id")
-            if rid is not None:
-                hit_counter[rid] += 1
-    top_rules = hit_counter.most_common(30)
-
     c.drawString(40, height - 126, "Top rules (rule_id : hits)")
     y = height - 144
-    for rid, hits in top_rules:
+    if rule_hits is None:
+        rule_hits = top_rules(df)
+    for rid, hits in rule_hits.head(30).items():
         c.drawString(44, y, f"{rid} : {hits}")
         y -= 12
         if y < 80:
@@ -126,18 +238,11 @@ def create_pdf_report(df: pd.DataFrame, out_path: str):
             y = height - 40
 
     # Wordcloud
-    combined = " ".join(df["text"].astype(str).tolist()).lower() if not df.empty else ""
-    if combined:
-        wc = WordCloud(width=800, height=400, background_color="white").generate(combined)
-        img_buf = io.BytesIO()
-        plt.figure(figsize=(8, 4))
-        plt.imshow(wc, interpolation="bilinear")
-        plt.axis("off")
-        plt.tight_layout()
-        plt.savefig(img_buf, format="png")
-        plt.close()
-        img_buf.seek(0)
-        img = ImageReader(img_buf)
+    freq = word_frequencies(df["text"], STOPWORDS) if not df.empty else Counter()
+    if freq:
+        wc = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(freq)
+        # ReportLab reads the PIL image directly: no Matplotlib figure or PNG round-trip
+        img = ImageReader(wc.to_image())
         c.showPage()
         c.setFont("Helvetica-Bold", 12)
         c.drawString(40, height - 40, "Word Cloud")
@@ -147,43 +252,42 @@ def create_pdf_report(df: pd.DataFrame, out_path: str):
     c.save()
 
 
-import json
-
 def simplify_export_df(df: pd.DataFrame, text_col="text", details_col="details", short_len: int = 200) -> pd.DataFrame:
-    df = df.copy()
-    # Short preview of text for CSV readability
-    df["short_text"] = (
+    # Copy only the small columns; text/details are read, never duplicated
+    out = df[[c for c in ("id", "uid", "score", "ts") if c in df.columns]].copy()
+    # Short preview of text for CSV readability (\s+ also covers newlines)
+    out["short_text"] = (
         df[text_col].astype(str)
-          .str.replace("\n", " ", regex=False)
           .str.replace(r"\s+", " ", regex=True)
           .str.strip()
           .str[:short_len]
     ) + "..."
-    # Ensure details is parsed and create top_rules, hit_count, reasons_preview
-    def summarize_details(d):
-        try:
-            arr = json.loads(d) if isinstance(d, str) else (d or [])
-            if not isinstance(arr, list):
-                arr = []
-        except Exception:
-            arr = []
-        top_rules = ",".join(str(x.get("rule_id")) for x in arr[:5])
-        hit_count = len(arr)
-        reasons = ";".join(f"{x.get('rule_id')}:{x.get('reason','')}" for x in arr[:5])
-        return top_rules, hit_count, reasons
-
-    parsed = df[details_col].apply(summarize_details).tolist()
-    if parsed:
-        df[["top_rules", "hit_count", "reasons_preview"]] = pd.DataFrame(parsed, index=df.index)
-    else:
-        df["top_rules"] = ""
-        df["hit_count"] = 0
-        df["reasons_preview"] = ""
+    # Parse the details column once, then build each summary column in one pass
+    parsed = [parse_details(d) for d in df[details_col]]
+    out["top_rules"] = [",".join(str(x.get("rule_id")) for x in arr[:5]) for arr in parsed]
+    out["hit_count"] = [len(arr) for arr in parsed]
+    out["reasons_preview"] = [
+        ";".join(f"{x.get('rule_id')}:{x.get('reason','')}" for x in arr[:5]) for arr in parsed
+    ]
 
     out_cols = ["id", "uid", "short_text", "score", "top_rules", "hit_count", "reasons_preview", "ts"]
     # keep only columns that exist
-    out_cols = [c for c in out_cols if c in df.columns]
-    return df[out_cols]
+    out_cols = [c for c in out_cols if c in out.columns]
+    return out[out_cols]
+
+@st.cache_data(ttl=600, show_spinner=False)
+def build_readable_exports(limit: int, db_sig: Optional[Tuple] = None) -> Tuple[bytes, Optional[bytes]]:
+    """(CSV bytes, Parquet bytes or None without pyarrow) of the readable export."""
+    readable = simplify_export_df(load_rows(limit, db_sig), short_len=250)
+    if pa is None:
+        return readable.to_csv(index=False).encode("utf-8"), None
+    # One Arrow table feeds both writers, each encoding in C
+    table = pa.Table.from_pandas(readable, preserve_index=False)
+    csv_buf = io.BytesIO()
+    pa_csv.write_csv(table, csv_buf)
+    pq_buf = io.BytesIO()
+    pq.write_table(table, pq_buf)
+    return csv_buf.getvalue(), pq_buf.getvalue()
 
 # -----------------------
 # Layout / Navigation
@@ -203,6 +307,14 @@ menu = st.sidebar.radio(
     ],
     index=0
 )
+if st.sidebar.button("Refresh data"):
+    load_rows.clear()
+    load_light_rows.clear()
+    load_page.clear()
+    count_rows.clear()
+    compute_rule_hits.clear()
+    build_readable_exports.clear()
+    compute_wordcloud.clear()
 
 # -----------------------
 # Page: Upload & Manage Files
@@ -325,27 +437,48 @@ elif menu == "Run Pipeline":
         log_box = st.empty()
         progress_bar = st.progress(0)
 
-        # Best-effort progress reporting: if pipeline_from_folder supports callbacks you'd use it.
-        # Here we show an optimistic progress update and a final report.
+        executor = get_pipeline_executor()
+
         try:
+            # Progress = rows saved so far vs. an estimate from file sizes
+            # (~6 bytes per word); duplicates are skipped, so it may finish early
+            txt_bytes = 0
+            for f in list_text_files(TEXT_FOLDER):
+                try:
+                    txt_bytes += os.path.getsize(os.path.join(TEXT_FOLDER, f))
+                except OSError:
+                    pass  # removed or renamed since the listing
+            expected = max(1, txt_bytes // (6 * int(group_size)))
+            start_rowid = get_storage().max_rowid() or 0
+
             log_box.text("Initializing pipeline...")
-            results = pipeline_from_folder(
-                folder_path=TEXT_FOLDER,
+            fut = executor.submit(
+                run_folder_job,
+                TEXT_FOLDER,
+                DB_PATH,
                 rules_path=RULES_PATH,
-                group_size=group_size,
-                storage=storage,
-                max_workers=workers,
-                save=True
+                group_size=int(group_size),
+                max_workers=int(workers)
             )
-            # results is expected to be a list of processed chunks or similar
-            total = len(results) if results is not None else 0
-            for i in range(0, 100):
-                progress_bar.progress(i + 1)
+            while not fut.done():
+                saved = (get_storage().max_rowid() or 0) - start_rowid
+                progress_bar.progress(min(99, saved * 100 // expected))
+                log_box.text(f"Processing... {saved} chunks saved so far")
+                time.sleep(0.5)
+
+            summary = fut.result()
+            total = summary["total"]
+            progress_bar.progress(100)
             log_box.text(f"Processing finished: {total} chunks processed.")
             st.success(f"Processing finished: {total} chunks processed.")
-            if isinstance(results, list) and results:
+            if summary["sample"]:
                 st.write("Sample processed items (first 3):")
-                st.write(results[:3])
+                st.write(summary["sample"])
+        except BrokenProcessPool as exc:
+            # The worker died; start a fresh pool on the next run
+            executor.shutdown(wait=False)
+            get_pipeline_executor.clear()
+            st.error(f"Pipeline failed: {exc}")
         except Exception as exc:
             st.error(f"Pipeline failed: {exc}")
         finally:
@@ -361,24 +494,14 @@ elif menu == "Overview":
         "viewing/searching results, analyzing rule hits, and improving storage. Use the left navigation to move between steps."
     )
 
-    df = load_rows(limit=5000)
+    df = load_light_rows(5000, db_signature())
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Chunks stored", len(df))
     col2.metric("Avg score", round(df["score"].mean(), 2) if not df.empty else "N/A")
     col3.metric("Unique UIDs", int(df["uid"].nunique()) if not df.empty else 0)
     # Simple top rule preview
-    if not df.empty:
-        hit_counter = Counter()
-        for item in df["details"]:
-            details = parse_details(item)
-            for d in details:
-                rid = d.get("rule_id")
-                if rid is not None:
-                    hit_counter[rid] += 1
-        top = hit_counter.most_common(5)
-        col4.metric("Top rule (id : hits)", f"{top[0][0]} : {top[0][1]}" if top else "N/A")
-    else:
-        col4.metric("Top rule (id : hits)", "N/A")
+    top = compute_rule_hits(5000, db_signature()).head(1)
+    col4.metric("Top rule (id : hits)", f"{top.index[0]} : {top.iloc[0]}" if not top.empty else "N/A")
 
     st.subheader("Score distribution")
     if df.empty:
@@ -402,7 +525,7 @@ elif menu == "Search":
             st.error("Enter a search query.")
         else:
             try:
-                results = search_in_storage(storage, query=query, limit=int(max_results), use_regex=use_regex)
+                results = search_in_storage(get_storage(), query=query, limit=int(max_results), use_regex=use_regex)
                 if not results:
                     st.warning("No results found.")
                 else:
@@ -421,24 +544,39 @@ elif menu == "Search":
 elif menu == "View Records":
     st.header("🔎 View Records (DB)")
     st.info("Browse chunks saved in the database. Use pagination for large datasets.")
-    df = load_rows(limit=20000)
-    if df.empty:
+    total = count_rows(db_signature())
+    if total == 0:
         st.warning("No records found.")
     else:
         # pagination controls
         page_size = st.selectbox("Rows per page", [10, 25, 50, 100], index=2)
-        total_pages = (len(df) - 1) // page_size + 1
-        page_num = st.number_input("Page number (0-indexed)", min_value=0, max_value=max(0, total_pages - 1), value=0, step=1)
-        page_df = paginate_df(df, page_size, page_num)
+        # Keyset pagination: cursors[p] is the id bound of page p. New rows get
+        # higher ids, so the cursors stay valid while the pipeline writes.
+        if st.session_state.get("records_page_size") != page_size:
+            st.session_state["records_page_size"] = page_size
+            st.session_state["records_cursors"] = [None]
+        cursors = st.session_state["records_cursors"]
+        page_df = load_page(cursors[-1], page_size, db_signature())
+        col1, col2 = st.columns(2)
+        col1.button("◀ Previous", disabled=len(cursors) == 1, on_click=cursors.pop)
+        col2.button(
+            "Next ▶",
+            disabled=len(page_df) < page_size,
+            on_click=cursors.append,
+            args=(int(page_df["id"].iloc[-1]) if len(page_df) else None,)
+        )
         st.dataframe(page_df, use_container_width=True)
-        # human-friendly export
-        readable = simplify_export_df(df, short_len=250)
-        csv_bytes = readable.to_csv(index=False).encode("utf-8")
-        st.download_button("Download readable DB (CSV)", csv_bytes, "all_records_readable.csv")
-        # optional: keep raw full export as a secondary download (uncomment if needed)
-        # raw_bytes = df.to_csv(index=False).encode("utf-8")
-        # st.download_button("Download raw DB (full)", raw_bytes, "all_records_raw.csv")
-        st.write(f"Showing page {page_num} of {total_pages - 1} (0-indexed)")
+        total_pages = (total - 1) // page_size + 1
+        st.write(f"Showing page {len(cursors) - 1} of {total_pages - 1} (0-indexed)")
+        # human-friendly export, built only on request
+        if st.checkbox("Prepare export of the newest 20000 records"):
+            csv_bytes, parquet_bytes = build_readable_exports(20000, db_signature())
+            st.download_button("Download readable DB (CSV)", csv_bytes, "all_records_readable.csv")
+            if parquet_bytes is not None:
+                st.download_button("Download readable DB (Parquet)", parquet_bytes, "all_records_readable.parquet")
+            # optional: keep raw full export as a secondary download (uncomment if needed)
+            # raw_bytes = load_rows(20000, db_signature()).to_csv(index=False).encode("utf-8")
+            # st.download_button("Download raw DB (full)", raw_bytes, "all_records_raw.csv")
 
 
 # -----------------------
@@ -447,7 +585,8 @@ elif menu == "View Records":
 elif menu == "Analytics":
     st.header("📊 Analytics")
     st.info("Explore visual insights from the processed chunks: word cloud, score histogram, top rules.")
-    df = load_rows(limit=10000)
+    # Scores only: the text is loaded by the word cloud, when it is asked for
+    df = load_light_rows(10000, db_signature())
     if df.empty:
         st.warning("No records to analyze. Run the pipeline first.")
     else:
@@ -456,29 +595,20 @@ elif menu == "Analytics":
             st.plotly_chart(fig, use_container_width=True)
 
         with st.expander("Word Cloud", expanded=False):
-            combined = " ".join(df["text"].astype(str).tolist()).lower()
-            stopwords = set([
+            stopwords = (
                 "the", "and", "a", "to", "i", "is", "it", "of", "for", "you", "we", "that", "this", "in", "on", "your"
-            ])
-            wc = WordCloud(width=1200, height=600, stopwords=stopwords, background_color="white").generate(combined)
-            fig_wc, ax = plt.subplots(figsize=(12, 6))
-            ax.imshow(wc, interpolation="bilinear")
-            ax.axis("off")
-            st.pyplot(fig_wc)
-
-            words = wc.words_
-            top = pd.DataFrame(list(words.items()), columns=["word", "score"]).head(50)
-            st.dataframe(top, use_container_width=True)
+            )
+            # Collapsed expanders still run their body, so build only on request
+            if st.checkbox("Build word cloud"):
+                png, top = compute_wordcloud(10000, db_signature(), stopwords)
+                if png is None:
+                    st.write("No words to draw.")
+                else:
+                    st.image(png, use_column_width=True)
+                    st.dataframe(top, use_container_width=True)
 
         with st.expander("Top rule hits", expanded=False):
-            hit_counter = Counter()
-            for item in df["details"]:
-                details = parse_details(item)
-                for d in details:
-                    rid = d.get("rule_id")
-                    if rid is not None:
-                        hit_counter[rid] += 1
-            hit_df = pd.DataFrame([{"rule_id": k, "hits": v} for k, v in hit_counter.items()]).sort_values("hits", ascending=False)
+            hit_df = compute_rule_hits(10000, db_signature()).rename_axis("rule_id").reset_index(name="hits")
             if hit_df.empty:
                 st.write("No rule hits found.")
             else:
@@ -498,7 +628,7 @@ elif menu == "Storage Improver":
     if st.button("Run improver"):
         with st.spinner("Running storage improver..."):
             try:
-                improver = StorageImprover(storage)
+                improver = StorageImprover(get_storage())
                 suggestions = improver.run(limit=5000, min_freq=int(min_freq), auto_update=False)
                 cnt = len(suggestions) if suggestions else 0
                 st.success(f"Generated {cnt} suggestions")
@@ -544,8 +674,7 @@ elif menu == "Rules Manager":
                     try:
                         new_rules = json.loads(edited)
                         backup = save_rules_backup(RULES_PATH)
-                        with open(RULES_PATH, "w", encoding="utf-8") as wf:
-                            json.dump(new_rules, wf, indent=2, ensure_ascii=False)
+                        save_json(new_rules, RULES_PATH)
                         st.success(f"Saved rules.json. Backup saved at: {backup}")
                     except Exception as exc:
                         st.error(f"Invalid JSON or save failed: {exc}")
@@ -559,15 +688,16 @@ elif menu == "Rules Manager":
 elif menu == "PDF Report":
     st.header("📄 Generate PDF Report")
     st.info("Generate a simple PDF with summary stats, top rules and a word cloud.")
-    df = load_rows(limit=10000)
-    if df.empty:
+    total = count_rows(db_signature())
+    if total == 0:
         st.warning("No data to create a report. Run the pipeline first.")
     else:
-        st.write(f"Chunks available for report: {len(df)}")
+        st.write(f"Chunks available for report: {min(total, 10000)}")
         if st.button("Generate PDF report"):
             with st.spinner("Creating PDF report..."):
                 try:
-                    create_pdf_report(df, REPORT_PATH)
+                    df = load_rows(10000, db_signature())
+                    create_pdf_report(df, REPORT_PATH, rule_hits=compute_rule_hits(10000, db_signature()))
                     st.success(f"Report created: {REPORT_PATH}")
                     with open(REPORT_PATH, "rb") as fh:
                         st.download_button("Download PDF Report", fh.read(), file_name="report.pdf", mime="application/pdf")
@@ -0,0 +1,36 @@
+import unittest
+
+from app.checker.checker import Checker
+
+
+RULES = [{"id": "r1", "type": "keyword_any", "keywords": ["delay"], "score": 1}]
+
+
+class FlakyStorage:
+    """Fails every bulk save whose first uid is in `fail_on`."""
+    def __init__(self, fail_on):
+        self.fail_on = set(fail_on)
+        self.saved = []
+
+    def save_checks_bulk(self, rows):
+        if rows[0][0] in self.fail_on:
+            raise RuntimeError("database is locked")
+        self.saved.extend(r[0] for r in rows)
+
+
+class CheckerSaveFailureTest(unittest.TestCase):
+    def test_failed_batches_are_reported_and_not_returned(self):
+        items = [{"uid": f"u{i}", "text": f"delay {i}", "text_hash": f"h{i}"} for i in range(10)]
+        storage = FlakyStorage(fail_on={"u0"})
+        checker = Checker(RULES, storage=storage, max_workers=1, use_processes=False)
+        checker.SAVE_BATCH_SIZE = 1
+
+        results = checker.run_checks(items, save=True)
+
+        self.assertEqual(checker.failed_uids, ["u0"])
+        self.assertEqual(sorted(r["uid"] for r in results), sorted(storage.saved))
+        self.assertEqual(len(results), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import json
+import os
+import tempfile
+import unittest
+
+from app.storage.storage import Storage
+from app.storage.storage_improver import _parse_details_json
+
+
+DETAILS = [{"rule_id": "r1", "reason": "keyword_any:delay"}, {"rule_id": "r2", "reason": "length_min"}]
+# Rows written before the details fix: run_checks encoded, save_check encoded again
+DOUBLE_ENCODED = json.dumps(json.dumps(DETAILS))
+
+
+class DoubleEncodedDetailsTest(unittest.TestCase):
+    def test_parse_unwraps_double_encoded_details(self):
+        self.assertEqual(_parse_details_json(DOUBLE_ENCODED), DETAILS)
+        self.assertEqual(_parse_details_json(json.dumps(DETAILS)), DETAILS)
+
+    def test_rule_hit_aggregation_counts_double_encoded_rows(self):
+        with tempfile.TemporaryDirectory() as d:
+            storage = Storage(os.path.join(d, "checks.db"))
+            try:
+                storage.save_checks_bulk([
+                    ("u1", "legacy row", 1.0, DOUBLE_ENCODED, "h1"),
+                    ("u2", "new row", 1.0, json.dumps(DETAILS[:1]), "h2"),
+                ])
+                self.assertEqual(storage.aggregate_rule_hits(10), {"r1": 2, "r2": 1})
+            finally:
+                storage.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
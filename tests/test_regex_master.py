@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+from app.checker import rules
+from app.checker.rules import RegexMaster, prepare_rule
+
+
+PATTERNS = [r"\s\S", r"a\sb", r"time\s*out", r"[[:space:]]x", r"caf\w", r"\d{3}-\d{4}"]
+TEXTS = ["a\x1cb", "time\x1fout", "\x1cx", "ab", "café", "call 555-1234", "a b"]
+
+
+def _scan_all(master, prepared, text):
+    """Per-pattern verdict as evaluate_rule sees it (scan result or re fallback)."""
+    hits = master.scan(text)
+    verdicts = {}
+    for rule in prepared:
+        compiled = rule["_compiled"]
+        hit = hits.get(compiled.pattern) if hits else None
+        if hit is None:
+            hit = compiled.search(text) is not None
+        verdicts[compiled.pattern] = hit
+    return verdicts
+
+
+class RegexMasterHyperscanTest(unittest.TestCase):
+    def setUp(self):
+        self.prepared = [
+            prepare_rule({"id": str(i), "type": "regex_match", "pattern": p, "score": 1})
+            for i, p in enumerate(PATTERNS)
+        ]
+
+    @unittest.skipIf(rules.hyperscan is None, "hyperscan not installed")
+    def test_hyperscan_matches_re_on_separator_controls(self):
+        with_hs = RegexMaster(self.prepared)
+        self.assertIsNotNone(with_hs._hs_db)
+        with mock.patch.object(rules, "hyperscan", None):
+            pure_re = RegexMaster(self.prepared)
+        for text in TEXTS:
+            self.assertEqual(
+                _scan_all(with_hs, self.prepared, text),
+                _scan_all(pure_re, self.prepared, text),
+                repr(text)
+            )
+
+    def test_scan_agrees_with_individual_search(self):
+        master = RegexMaster(self.prepared)
+        for text in TEXTS:
+            for rule in self.prepared:
+                compiled = rule["_compiled"]
+                self.assertEqual(
+                    _scan_all(master, self.prepared, text)[compiled.pattern],
+                    compiled.search(text) is not None,
+                    (compiled.pattern, text)
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()